@@ -0,0 +1,7 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def no_query_log(settings):
+    '''Журнал SQL-запросов в тестах выключен, как в core.test_runner.'''
+    settings.QUERY_LOG_SAMPLE_RATE = 0
@@ -1,5 +1,19 @@
 from django.apps import AppConfig
+from django.core.management import call_command
+from django.db.models.signals import post_migrate
+
+
+def create_cache_tables(using, **kwargs):
+    '''
+    Общий кеш хранится в таблице БД (см. CACHES), поэтому таблица
+    создается вместе с остальной схемой при каждом migrate.
+    '''
+    call_command('createcachetable', database=using, verbosity=0)
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from core import db  # noqa: F401
+        post_migrate.connect(create_cache_tables, sender=self)
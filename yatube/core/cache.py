@@ -0,0 +1,190 @@
+'''
+Двухуровневый кеш: небольшой LRU-кеш в памяти процесса перед общим
+для всех процессов кешем (LOCATION - имя общего кеша в settings.CACHES).
+
+Локальная копия живет не дольше LOCAL_TIMEOUT секунд, поэтому изменения,
+сделанные другими процессами, видны с задержкой не больше этого срока.
+Ключи из BYPASS_PREFIXES (счетчики поколений и т.п.) всегда читаются
+из общего кеша. Объем локального кеша ограничен MAX_SIZE байтами.
+'''
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from core.metrics import record_cache
+
+_MISSING = object()
+
+# Django создает экземпляр кеша в каждом потоке, а локальный уровень
+# должен быть общим для процесса, поэтому данные хранятся на уровне модуля.
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+class _LocalStore:
+    def __init__(self):
+        self.data = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        self.local_hits = self.shared_hits = self.misses = 0
+
+
+class NearCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = location
+        self._max_size = int(options.get('MAX_SIZE', 8 * 1024 * 1024))
+        self._local_timeout = options.get('LOCAL_TIMEOUT', 5)
+        self._bypass = tuple(options.get('BYPASS_PREFIXES', ()))
+        with _stores_lock:
+            self._store = _stores.setdefault(location, _LocalStore())
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    def stats(self):
+        '''Статистика попаданий и заполненности локального кеша.'''
+        store = self._store
+        with store.lock:
+            return {
+                'local_hits': store.local_hits,
+                'shared_hits': store.shared_hits,
+                'misses': store.misses,
+                'entries': len(store.data),
+                'size': store.size,
+            }
+
+    def _forget(self, local_key):
+        entry = self._store.data.pop(local_key, None)
+        if entry is not None:
+            self._store.size -= len(entry[1])
+
+    def _remember(self, key, value, timeout, version):
+        local_key = self.make_key(key, version)
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        lifetime = self._local_timeout
+        if timeout is not None:
+            lifetime = min(lifetime, timeout)
+        data = None
+        if not key.startswith(self._bypass) and lifetime > 0:
+            data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        store = self._store
+        with store.lock:
+            self._forget(local_key)
+            if data is None or len(data) > self._max_size:
+                return
+            store.data[local_key] = (time.monotonic() + lifetime, data)
+            store.size += len(data)
+            while store.size > self._max_size:
+                _, (_, evicted) = store.data.popitem(last=False)
+                store.size -= len(evicted)
+
+    def _lookup(self, key, version):
+        local_key = self.make_key(key, version)
+        store = self._store
+        with store.lock:
+            entry = store.data.get(local_key)
+            if entry is None:
+                return _MISSING
+            if entry[0] < time.monotonic():
+                self._forget(local_key)
+                return _MISSING
+            store.data.move_to_end(local_key)
+            store.local_hits += 1
+        record_cache('local')
+        return pickle.loads(entry[1])
+
+    def get(self, key, default=None, version=None):
+        value = self._lookup(key, version)
+        if value is not _MISSING:
+            return value
+        value = self.shared.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            with self._store.lock:
+                self._store.misses += 1
+            record_cache('miss')
+            return default
+        with self._store.lock:
+            self._store.shared_hits += 1
+        record_cache('shared')
+        self._remember(key, value, self._local_timeout, version)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        for key in keys:
+            value = self._lookup(key, version)
+            if value is not _MISSING:
+                found[key] = value
+        rest = [key for key in keys if key not in found]
+        if rest:
+            shared = self.shared.get_many(rest, version=version)
+            with self._store.lock:
+                self._store.shared_hits += len(shared)
+                self._store.misses += len(rest) - len(shared)
+            for key in rest:
+                record_cache('shared' if key in shared else 'miss')
+            for key, value in shared.items():
+                self._remember(key, value, self._local_timeout, version)
+            found.update(shared)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version=version)
+        self._remember(key, value, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version=version)
+        for key, value in data.items():
+            if key not in failed:
+                self._remember(key, value, timeout, version)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version=version)
+        if added:
+            self._remember(key, value, timeout, version)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version=version)
+
+    def has_key(self, key, version=None):
+        if self._lookup(key, version) is not _MISSING:
+            return True
+        return self.shared.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        with self._store.lock:
+            self._forget(self.make_key(key, version))
+        return self.shared.incr(key, delta, version=version)
+
+    def delete(self, key, version=None):
+        with self._store.lock:
+            self._forget(self.make_key(key, version))
+        self.shared.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        with self._store.lock:
+            for key in keys:
+                self._forget(self.make_key(key, version))
+        self.shared.delete_many(keys, version=version)
+
+    def clear_local(self):
+        '''Очищает только локальный уровень, как в новом процессе.'''
+        with self._store.lock:
+            self._store.data.clear()
+            self._store.size = 0
+
+    def clear(self):
+        with self._store.lock:
+            self._store.data.clear()
+            self._store.size = 0
+        self.shared.clear()
@@ -0,0 +1,61 @@
+'''
+Настройка соединений с SQLite.
+
+При открытии каждого соединения apply_pragmas выполняет PRAGMA
+из настройки SQLITE_PRAGMAS: журнал WAL позволяет читать во время
+записи, synchronous=NORMAL в режиме WAL сбрасывает данные на диск
+только при checkpoint, mmap и увеличенный кеш страниц сокращают
+системные вызовы при чтении.
+
+Занятую другой записью базу SQLite ждет до timeout секунд (OPTIONS
+в DATABASES), но транзакция, которая начала с чтения, получает
+"database is locked" сразу: ее снимок устарел. retry_on_busy повторяет
+такие транзакции целиком.
+'''
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db import OperationalError, transaction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+@receiver(connection_created)
+def apply_pragmas(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def is_busy(error):
+    '''Ошибка из-за того, что база или таблица заняты другой записью.'''
+    return isinstance(error, OperationalError) and 'locked' in str(error)
+
+
+def retry_on_busy(func):
+    '''
+    Декоратор: выполняет func в транзакции и, если база занята,
+    повторяет ее до SQLITE_BUSY_RETRIES раз с удваивающейся паузой
+    от SQLITE_BUSY_DELAY секунд. Внутри уже открытой транзакции
+    блокировку держит внешняя транзакция, и func выполняется без
+    повторов.
+    '''
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if transaction.get_connection().in_atomic_block:
+            return func(*args, **kwargs)
+        retries = getattr(settings, 'SQLITE_BUSY_RETRIES', 0)
+        delay = getattr(settings, 'SQLITE_BUSY_DELAY', 0.05)
+        for attempt in range(retries + 1):
+            try:
+                with transaction.atomic():
+                    return func(*args, **kwargs)
+            except OperationalError as error:
+                if not is_busy(error) or attempt == retries:
+                    raise
+            time.sleep(delay * 2 ** attempt)
+    return wrapper
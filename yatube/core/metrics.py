@@ -0,0 +1,191 @@
+'''
+Метрики производительности запросов.
+
+MetricsMiddleware заводит на время запроса объект RequestMetrics, куда
+записываются число и время SQL-запросов, время отрисовки шаблонов и
+подготовки миниатюр, обращения к кешу. По итогам запроса значения
+попадают в гистограммы по каждому view, которые отдаются в формате
+Prometheus (см. core.views.metrics). Гистограммы хранятся в памяти
+процесса: при нескольких процессах у каждого свои значения.
+'''
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.core.cache import cache
+
+# Границы корзин гистограмм: время в секундах и число SQL-запросов
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+HISTOGRAMS = {
+    'yatube_request_duration_seconds': (
+        'Время обработки запроса', TIME_BUCKETS),
+    'yatube_sql_queries': ('SQL-запросов за запрос', QUERY_BUCKETS),
+    'yatube_sql_duration_seconds': (
+        'Время SQL-запросов за запрос', TIME_BUCKETS),
+    'yatube_template_duration_seconds': (
+        'Время отрисовки шаблонов без SQL и миниатюр', TIME_BUCKETS),
+    'yatube_thumbnail_duration_seconds': (
+        'Время подготовки миниатюр за запрос', TIME_BUCKETS),
+}
+CACHE_COUNTER = 'yatube_cache_requests_total'
+
+_current = ContextVar('request_metrics', default=None)
+_lock = threading.Lock()
+_histograms = {}
+_cache_requests = {}
+
+
+class RequestMetrics:
+    '''Замеры одного запроса.'''
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.durations = {'sql': 0.0, 'template': 0.0, 'thumbnail': 0.0}
+        self.cache = {'local': 0, 'shared': 0, 'miss': 0}
+        self._active = set()
+
+    def __call__(self, execute, sql, params, many, context):
+        '''Обертка для connection.execute_wrapper.'''
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_count += 1
+            self.durations['sql'] += time.perf_counter() - started
+
+    def server_timing(self):
+        '''Значение заголовка Server-Timing, время - в миллисекундах.'''
+        total = (time.perf_counter() - self.started) * 1000
+        parts = [
+            f'sql;dur={self.durations["sql"] * 1000:.1f};'
+            f'desc="{self.sql_count} queries"',
+            f'tpl;dur={self.durations["template"] * 1000:.1f}',
+            f'thumb;dur={self.durations["thumbnail"] * 1000:.1f}',
+            'cache;desc="' + ' '.join(
+                f'{result}={count}' for result, count in self.cache.items()
+            ) + '"',
+            f'total;dur={total:.1f}',
+        ]
+        return ', '.join(parts)
+
+
+def start():
+    '''Начинает замеры запроса и возвращает токен для finish().'''
+    return _current.set(RequestMetrics())
+
+
+def finish(token):
+    _current.reset(token)
+
+
+def current():
+    '''Замеры текущего запроса или None вне запроса.'''
+    return _current.get()
+
+
+@contextmanager
+def timer(name, exclude=()):
+    '''
+    Добавляет время выполнения блока к замеру name текущего запроса.
+    Время замеров из exclude, накопленное внутри блока, вычитается.
+    Вложенные блоки с тем же name не считаются повторно.
+    '''
+    metrics = current()
+    if metrics is None or name in metrics._active:
+        yield
+        return
+    metrics._active.add(name)
+    before = sum(metrics.durations[other] for other in exclude)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        elapsed -= sum(
+            metrics.durations[other] for other in exclude) - before
+        metrics.durations[name] += max(elapsed, 0)
+        metrics._active.discard(name)
+
+
+def record_cache(result):
+    '''Учитывает обращение к кешу: 'local', 'shared' или 'miss'.'''
+    metrics = current()
+    if metrics is not None:
+        metrics.cache[result] += 1
+
+
+def _observe(name, view, value):
+    buckets = HISTOGRAMS[name][1]
+    histogram = _histograms.setdefault(
+        (name, view), [[0] * len(buckets), 0.0, 0])
+    for index, bound in enumerate(buckets):
+        if value <= bound:
+            histogram[0][index] += 1
+    histogram[1] += value
+    histogram[2] += 1
+
+
+def observe(view, metrics):
+    '''Добавляет замеры завершенного запроса в гистограммы view.'''
+    total = time.perf_counter() - metrics.started
+    with _lock:
+        _observe('yatube_request_duration_seconds', view, total)
+        _observe('yatube_sql_queries', view, metrics.sql_count)
+        _observe('yatube_sql_duration_seconds', view,
+                 metrics.durations['sql'])
+        _observe('yatube_template_duration_seconds', view,
+                 metrics.durations['template'])
+        _observe('yatube_thumbnail_duration_seconds', view,
+                 metrics.durations['thumbnail'])
+        for result, count in metrics.cache.items():
+            key = (view, result)
+            _cache_requests[key] = _cache_requests.get(key, 0) + count
+
+
+def reset():
+    '''Очищает накопленные гистограммы.'''
+    with _lock:
+        _histograms.clear()
+        _cache_requests.clear()
+
+
+def _labels(**labels):
+    return '{' + ','.join(
+        f'{name}="{value}"' for name, value in labels.items()) + '}'
+
+
+def render_prometheus():
+    '''Возвращает накопленные метрики в текстовом формате Prometheus.'''
+    lines = []
+    with _lock:
+        for name, (help_text, buckets) in HISTOGRAMS.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} histogram')
+            for (metric, view), (counts, total, count) in sorted(
+                    _histograms.items()):
+                if metric != name:
+                    continue
+                for bound, value in zip(buckets, counts):
+                    lines.append(
+                        f'{name}_bucket{_labels(view=view, le=bound)} '
+                        f'{value}')
+                lines.append(
+                    f'{name}_bucket{_labels(view=view, le="+Inf")} {count}')
+                lines.append(f'{name}_sum{_labels(view=view)} {total}')
+                lines.append(f'{name}_count{_labels(view=view)} {count}')
+        lines.append(f'# HELP {CACHE_COUNTER} Обращения к кешу')
+        lines.append(f'# TYPE {CACHE_COUNTER} counter')
+        for (view, result), count in sorted(_cache_requests.items()):
+            lines.append(
+                f'{CACHE_COUNTER}{_labels(view=view, result=result)} '
+                f'{count}')
+    stats = getattr(cache, 'stats', None)
+    if stats is not None:
+        for name, value in stats().items():
+            lines.append(f'# TYPE yatube_near_cache_{name} gauge')
+            lines.append(f'yatube_near_cache_{name} {value}')
+    return '\n'.join(lines) + '\n'
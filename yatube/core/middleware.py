@@ -0,0 +1,37 @@
+from contextlib import ExitStack
+
+from django.db import connection
+
+from core import metrics, querylog
+
+
+class MetricsMiddleware:
+    '''
+    Замеряет запрос (см. core.metrics) и добавляет к ответу заголовок
+    Server-Timing. Для части запросов ведет журнал медленных
+    и повторяющихся SQL-запросов (см. core.querylog).
+    Должен стоять первым в MIDDLEWARE.
+    '''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = metrics.start()
+        current = metrics.current()
+        recorder = querylog.QueryRecorder() if querylog.sampled() else None
+        try:
+            with ExitStack() as stack:
+                stack.enter_context(connection.execute_wrapper(current))
+                if recorder is not None:
+                    stack.enter_context(connection.execute_wrapper(recorder))
+                response = self.get_response(request)
+        finally:
+            metrics.finish(token)
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        metrics.observe(view, current)
+        if recorder is not None:
+            querylog.report(view, recorder)
+        response['Server-Timing'] = current.server_timing()
+        return response
@@ -0,0 +1,2 @@
+# Моделей у приложения нет. Модуль нужен, чтобы migrate отправлял
+# post_migrate для core (см. CoreConfig.ready).
@@ -0,0 +1,86 @@
+'''
+Журнал медленных и повторяющихся SQL-запросов.
+
+MetricsMiddleware включает QueryRecorder для доли запросов
+QUERY_LOG_SAMPLE_RATE (0 - журнал выключен). После ответа в логгер
+yatube.queries пишутся запросы дольше SLOW_QUERY_MS миллисекунд и
+запросы, выполненные несколько раз с одними и теми же параметрами,
+вместе с view и строкой кода проекта, откуда они были вызваны.
+'''
+import logging
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+from django.conf import settings
+
+logger = logging.getLogger('yatube.queries')
+
+# Модули, через которые запросы проходят транзитом: инструменты замеров
+# и кеш. Источником запроса считается код, который их вызвал.
+_TRANSIT = tuple(
+    os.path.join(os.path.dirname(__file__), name) for name in (
+        'cache.py', 'metrics.py', 'middleware.py', 'querylog.py',
+        'template_backends.py',
+    )
+)
+_TRANSACTION_COMMANDS = ('BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT',
+                         'RELEASE')
+
+
+def sampled():
+    '''Решает, записывать ли запросы текущего HTTP-запроса.'''
+    rate = getattr(settings, 'QUERY_LOG_SAMPLE_RATE', 0)
+    return rate > 0 and random.random() < rate
+
+
+def _caller():
+    # Ближайший к запросу кадр стека из кода проекта, а не Django.
+    # Запросы из шаблонов относятся к вызову render во view.
+    frame = sys._getframe(2)
+    while frame is not None:
+        path = frame.f_code.co_filename
+        if (path.startswith(settings.BASE_DIR) and path not in _TRANSIT
+                and 'site-packages' not in path):
+            return (f'{os.path.relpath(path, settings.BASE_DIR)}:'
+                    f'{frame.f_lineno} in {frame.f_code.co_name}')
+        frame = frame.f_back
+    return '?'
+
+
+class QueryRecorder:
+    '''Обертка для connection.execute_wrapper, запоминающая запросы.'''
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((
+                sql, repr(params), (time.perf_counter() - started) * 1000,
+                _caller()
+            ))
+
+
+def report(view, recorder):
+    '''Пишет в журнал медленные и повторяющиеся запросы view.'''
+    slow_ms = getattr(settings, 'SLOW_QUERY_MS', 100)
+    callers = {}
+    for sql, params, duration, caller in recorder.queries:
+        callers.setdefault((sql, params), caller)
+        if duration >= slow_ms:
+            logger.warning('Медленный запрос (%.1f мс) в %s, %s: %s',
+                           duration, view, caller, sql)
+    # Команды управления транзакциями повторяются законно
+    repeats = Counter(
+        (sql, params) for sql, params, _, _ in recorder.queries
+        if not sql.lstrip().upper().startswith(_TRANSACTION_COMMANDS))
+    for (sql, params), count in repeats.items():
+        if count > 1:
+            logger.warning('Запрос выполнен %d раз в %s, %s: %s',
+                           count, view, callers[(sql, params)], sql)
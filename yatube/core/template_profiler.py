@@ -0,0 +1,65 @@
+'''
+Профилирование отрисовки шаблонов.
+
+TemplateProfiler на время работы подменяет Template._render (так же
+Django подменяет его в тестах) и замеряет каждый шаблон: сам шаблон,
+его extends и все include. Для шаблона считаются вызовы, полное время,
+собственное время (без вложенных шаблонов и SQL) и время SQL-запросов,
+выполненных при его отрисовке.
+'''
+import time
+
+from django.db import connection
+from django.template.base import Template
+
+
+class TemplateProfiler:
+    def __init__(self):
+        self.stats = {}
+        self._stack = []
+
+    def __enter__(self):
+        self._original = Template._render
+        profiler = self
+
+        def _render(template, context):
+            return profiler.measure(template, context)
+
+        Template._render = _render
+        self._wrapper = connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._wrapper.__exit__(*exc_info)
+        Template._render = self._original
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if self._stack:
+                self._stack[-1]['sql'] += time.perf_counter() - started
+
+    def measure(self, template, context):
+        frame = {'started': time.perf_counter(), 'children': 0.0, 'sql': 0.0}
+        self._stack.append(frame)
+        try:
+            return self._original(template, context)
+        finally:
+            self._stack.pop()
+            elapsed = time.perf_counter() - frame['started']
+            stats = self.stats.setdefault(
+                template.name or '<строка>',
+                {'calls': 0, 'total': 0.0, 'self': 0.0, 'sql': 0.0})
+            stats['calls'] += 1
+            stats['total'] += elapsed
+            stats['self'] += elapsed - frame['children'] - frame['sql']
+            stats['sql'] += frame['sql']
+            if self._stack:
+                self._stack[-1]['children'] += elapsed
+
+    def report(self):
+        '''Статистика по шаблонам, самые долгие - первыми.'''
+        return sorted(self.stats.items(), key=lambda item: -item[1]['total'])
@@ -1,6 +1,19 @@
+import asyncio
+import importlib
+import os
 from http import HTTPStatus
+from unittest.mock import patch
 
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from core import metrics, querylog
+from core.asgi import WsgiToAsgi
+from core.cache import NearCache
+from core.db import retry_on_busy
 
 
 class TestView(TestCase):
@@ -8,3 +21,155 @@ class TestView(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class TestNearCache(TestCase):
+    def setUp(self):
+        self.cache = NearCache('shared', {
+            'OPTIONS': {'MAX_SIZE': 1000, 'LOCAL_TIMEOUT': 60,
+                        'BYPASS_PREFIXES': ('counter',)},
+        })
+        self.cache.clear()
+
+    def test_reads_go_through_local_tier(self):
+        before = self.cache.stats()
+        self.cache.set('key', 'value')
+        caches['shared'].set('key', 'changed elsewhere')
+        self.assertEqual(self.cache.get('key'), 'value')
+        self.assertIsNone(self.cache.get('missing'))
+        after = self.cache.stats()
+        self.assertEqual(after['local_hits'] - before['local_hits'], 1)
+        self.assertEqual(after['misses'] - before['misses'], 1)
+
+    def test_bypass_keys_and_memory_bound(self):
+        self.cache.set('counter', 1)
+        self.cache.incr('counter')
+        self.assertEqual(self.cache.get('counter'), 2)
+        for number in range(20):
+            self.cache.set(f'key{number}', 'x' * 100)
+        self.assertLessEqual(self.cache.stats()['size'], 1000)
+        self.assertEqual(self.cache.get('key0'), 'x' * 100)
+
+
+class TestMetrics(TestCase):
+    def setUp(self):
+        metrics.reset()
+
+    def test_server_timing_and_prometheus_endpoint(self):
+        response = self.client.get(reverse('posts:index'))
+        timing = response['Server-Timing']
+        for name in ('sql;dur=', 'tpl;dur=', 'thumb;dur=', 'cache;desc=',
+                     'total;dur='):
+            self.assertIn(name, timing)
+        self.assertNotIn('desc="0 queries"', timing)
+
+        url = reverse('metrics')
+        self.assertEqual(
+            self.client.get(url).status_code, HTTPStatus.FOUND)
+        admin = get_user_model().objects.create_user(
+            'admin', password='secret', is_staff=True)
+        self.client.force_login(admin)
+        body = self.client.get(url).content.decode()
+        self.assertIn('# TYPE yatube_request_duration_seconds histogram',
+                      body)
+        self.assertIn(
+            'yatube_sql_queries_count{view="posts:index"} 1', body)
+        self.assertIn('yatube_near_cache_local_hits', body)
+
+
+class TestQueryLog(TestCase):
+    def test_duplicates_are_logged_with_caller(self):
+        recorder = querylog.QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            for _ in range(2):
+                get_user_model().objects.filter(username='nobody').exists()
+        with self.assertLogs('yatube.queries', 'WARNING') as logs:
+            querylog.report('posts:test', recorder)
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('2 раз в posts:test, core/tests.py:', logs.output[0])
+
+    @override_settings(QUERY_LOG_SAMPLE_RATE=1, SLOW_QUERY_MS=0)
+    def test_middleware_logs_slow_queries(self):
+        with self.assertLogs('yatube.queries', 'WARNING') as logs:
+            self.client.get(reverse('posts:index'))
+        self.assertIn('Медленный запрос', logs.output[0])
+        self.assertIn('posts:index', logs.output[0])
+
+
+class TestAsgi(TestCase):
+    def call(self, application, scope, body=b''):
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': body,
+                    'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        asyncio.run(application({
+            'type': 'http', 'http_version': '1.1', 'query_string': b'',
+            'headers': [], **scope,
+        }, receive, send))
+        return messages
+
+    def test_request_is_translated_to_wsgi(self):
+        def echo(environ, start_response):
+            start_response('201 Created', [('X-Path', environ['PATH_INFO'])])
+            return [environ['wsgi.input'].read(),
+                    environ['HTTP_COOKIE'].encode()]
+
+        start, body = self.call(WsgiToAsgi(echo), {
+            'method': 'POST', 'path': '/echo/',
+            'headers': [(b'cookie', b'a=1'), (b'cookie', b'b=2')],
+        }, body=b'data;')
+        self.assertEqual(start['status'], 201)
+        self.assertIn((b'x-path', b'/echo/'), start['headers'])
+        self.assertEqual(body['body'], b'data;a=1; b=2')
+
+    def test_django_application(self):
+        from yatube.asgi import application
+
+        start, body = self.call(
+            application, {'method': 'GET', 'path': '/about/author/'})
+        self.assertEqual(start['status'], HTTPStatus.OK)
+        self.assertIn('<html'.encode(), body['body'])
+
+
+class TestProductionSettings(TestCase):
+    def test_cached_template_loader(self):
+        with patch.dict(os.environ, {'DJANGO_SECRET_KEY': 'secret'}):
+            settings = importlib.import_module('yatube.settings_production')
+        self.assertFalse(settings.DEBUG)
+        options = settings.TEMPLATES[0]['OPTIONS']
+        self.assertEqual(options['loaders'][0][0],
+                         'django.template.loaders.cached.Loader')
+        self.assertFalse(settings.TEMPLATES[0]['APP_DIRS'])
+        self.assertIn('core.context_processors.year.year',
+                      options['context_processors'])
+
+
+class TestSQLite(TransactionTestCase):
+    def test_pragmas_applied(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute('PRAGMA temp_store')
+            self.assertEqual(cursor.fetchone()[0], 2)
+
+    @override_settings(SQLITE_BUSY_RETRIES=2, SQLITE_BUSY_DELAY=0)
+    def test_retry_on_busy(self):
+        calls = []
+
+        @retry_on_busy
+        def write(fail):
+            calls.append(fail)
+            if len(calls) <= fail:
+                raise OperationalError('database is locked')
+            return len(calls)
+
+        self.assertEqual(write(2), 3)
+        calls.clear()
+        with self.assertRaises(OperationalError):
+            write(3)
+        self.assertEqual(len(calls), 3)
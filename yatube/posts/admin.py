@@ -1,6 +1,8 @@
 from django.contrib import admin
 
-from posts.models import Comment, Follow, Group, Post
+from posts import search
+from posts.models import (Comment, Follow, Group, Post, Profile,
+                          ThumbnailJob)
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -16,8 +18,36 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        '''Ищет посты по поисковому индексу, а не перебором текстов.'''
+        if not search_term:
+            return queryset, False
+        return queryset.filter(pk__in=search.search(search_term)), False
+
+
+class ProfileAdmin(admin.ModelAdmin):
+    list_display = (
+        'user',
+        'posts_count',
+        'followers_count',
+        'following_count',
+    )
+    search_fields = ('user__username',)
+
+
+class ThumbnailJobAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'post',
+        'status',
+        'created',
+    )
+    list_filter = ('status',)
+
 
 admin.site.register(Post, PostAdmin)
+admin.site.register(Profile, ProfileAdmin)
+admin.site.register(ThumbnailJob, ThumbnailJobAdmin)
 admin.site.register(Group)
 admin.site.register(Comment)
 admin.site.register(Follow)
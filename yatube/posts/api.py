@@ -0,0 +1,206 @@
+'''
+JSON API для лент постов.
+
+Ответы строятся на тех же queryset, что и HTML-страницы (build_feed),
+страницы списков - курсорные. ETag списков складывается из поколения
+кеша страниц и времени последнего комментария (см. page_cache.py),
+поэтому клиент с актуальной копией получает 304 без обращения к базе.
+ETag страницы поста учитывает время изменения поста и его комментарии.
+Комментарии отдаются страницами, как и на HTML-странице поста.
+'''
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.db.models import Count, Max
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.views.decorators.http import condition, require_safe
+
+from .comments import get_comments_page
+from .conditional import request_post_state
+from .constants import NUMBER_POST_PER_PAGE
+from .feed import build_feed, get_follow_feed
+from .models import Follow, Group, Post, User
+from .page_cache import (get_changed_at, get_comments_changed_at,
+                         get_generation)
+from .utils import CursorPaginator
+
+
+def serialize_user(user):
+    return {
+        'username': user.username,
+        'full_name': user.get_full_name(),
+    }
+
+
+def serialize_post(post):
+    return {
+        'id': post.pk,
+        'text': post.text,
+        'pub_date': post.pub_date,
+        'author': serialize_user(post.author),
+        'group': post.group and {
+            'slug': post.group.slug,
+            'title': post.group.title,
+        },
+        'image': post.image.url if post.image else None,
+        'comments_count': post.comments_count,
+    }
+
+
+def serialize_comment(comment):
+    return {
+        'id': comment.pk,
+        'text': comment.text,
+        'created': comment.created,
+        'author': serialize_user(comment.author),
+        'parent': comment.parent_id,
+        'depth': comment.depth,
+    }
+
+
+def comment_page_data(request, post_id, page):
+    '''Страница комментариев к посту со ссылками на ответы и продолжение.'''
+    url = reverse('posts:comments', kwargs={'post_id': post_id})
+    results = []
+    for comment in page:
+        thread = None
+        if comment.has_replies:
+            thread = request.build_absolute_uri(reverse(
+                'posts:comment_thread',
+                kwargs={'post_id': post_id, 'comment_id': comment.pk}
+            ) + '?format=json')
+        results.append({**serialize_comment(comment), 'thread': thread})
+    next_url = None
+    if page.has_next():
+        next_url = request.build_absolute_uri(
+            f'{url}?' + urlencode({'cursor': page.next_cursor,
+                                   'format': 'json'}))
+    return {'results': results, 'next': next_url}
+
+
+def _page_url(request, cursor):
+    if cursor is None:
+        return None
+    return request.build_absolute_uri(
+        f'{request.path}?{urlencode({"cursor": cursor})}')
+
+
+def page_response(request, post_list, **extra):
+    '''Ответ со страницей постов и ссылками на соседние страницы.'''
+    page = CursorPaginator(
+        build_feed(post_list), NUMBER_POST_PER_PAGE
+    ).get_cursor_page(request.GET.get('cursor'))
+    return JsonResponse({
+        **extra,
+        'results': [serialize_post(post) for post in page],
+        'next': _page_url(request, page.next_cursor),
+        'previous': _page_url(request, page.previous_cursor),
+    })
+
+
+def api_login_required(view):
+    '''Вместо перенаправления на вход отвечает 401.'''
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse(
+                {'detail': 'Требуется авторизация.'}, status=401)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def _comments_changed_at(request):
+    # Вычисляется один раз на запрос для ETag и Last-Modified
+    if not hasattr(request, '_comments_changed_at'):
+        request._comments_changed_at = get_comments_changed_at()
+    return request._comments_changed_at
+
+
+def _feed_version(request):
+    # comments_count в списках меняется без смены поколения
+    changed = _comments_changed_at(request)
+    return f'{get_generation()}-{changed.timestamp() if changed else 0}'
+
+
+def feed_etag(request, *args, **kwargs):
+    return f'v1-{_feed_version(request)}'
+
+
+def feed_last_modified(request, *args, **kwargs):
+    return max(
+        filter(None, (get_changed_at(), _comments_changed_at(request))),
+        default=None
+    )
+
+
+def follow_etag(request):
+    # Лента подписок меняется и при подписке или отписке: количество
+    # и последний id подписок меняются при любом таком изменении.
+    if not request.user.is_authenticated:
+        return None
+    follows = Follow.objects.filter(user=request.user).aggregate(
+        count=Count('pk'), last=Max('pk'))
+    return (f'v1-{_feed_version(request)}-{request.user.pk}-'
+            f'{follows["count"]}-{follows["last"]}')
+
+
+def post_etag(request, post_id):
+    state = request_post_state(request, post_id)
+    if state is None:
+        return None
+    updated_at, comments_count, last_comment = state
+    return (f'v1-{updated_at.timestamp()}-{comments_count}-'
+            f'{last_comment.timestamp() if last_comment else 0}')
+
+
+def post_last_modified(request, post_id):
+    state = request_post_state(request, post_id)
+    if state is None:
+        return None
+    return max(filter(None, (state[0], state[2])))
+
+
+@require_safe
+@condition(etag_func=feed_etag, last_modified_func=feed_last_modified)
+def index(request):
+    return page_response(request, Post.objects.order_by('-pub_date'))
+
+
+@require_safe
+@condition(etag_func=feed_etag, last_modified_func=feed_last_modified)
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return page_response(request, group.posts.all(), group={
+        'slug': group.slug,
+        'title': group.title,
+        'description': group.description,
+    })
+
+
+@require_safe
+@condition(etag_func=feed_etag, last_modified_func=feed_last_modified)
+def profile(request, username):
+    author = get_object_or_404(User, username=username)
+    return page_response(request, author.posts.all(),
+                         author=serialize_user(author))
+
+
+@require_safe
+@condition(etag_func=post_etag, last_modified_func=post_last_modified)
+def post_detail(request, post_id):
+    post = get_object_or_404(build_feed(Post.objects.all()), pk=post_id)
+    comments = comment_page_data(request, post.pk, get_comments_page(post.pk))
+    return JsonResponse({
+        **serialize_post(post),
+        'comments': comments['results'],
+        'comments_next': comments['next'],
+    })
+
+
+@require_safe
+@api_login_required
+@condition(etag_func=follow_etag)
+def follow_index(request):
+    return page_response(request, get_follow_feed(request.user))
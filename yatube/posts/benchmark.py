@@ -0,0 +1,467 @@
+'''
+Нагрузочные замеры страниц приложения posts.
+
+synthesize() наполняет базу синтетическими данными: авторы и подписки
+распределены по закону Ципфа, поэтому у немногих авторов большая часть
+постов и подписчиков, как на настоящих сайтах. Данные сохраняются
+через posts.dump, с теми же пачками bulk_create, что и при загрузке
+выгрузки.
+
+run() запрашивает страницы через тестовый клиент Django (или по HTTP
+у запущенного сервера) и собирает время ответа, число SQL-запросов
+и пиковый объем памяти процесса. run_concurrent() выполняет запросы
+параллельно через WSGI-приложение или его ASGI-обертку и замеряет
+пропускную способность. run_sqlite_profiles() сравнивает смешанную
+нагрузку чтения и записи с настройками SQLite по умолчанию и с PRAGMA
+из SQLITE_PRAGMAS и постоянными соединениями.
+'''
+import asyncio
+import itertools
+import json
+import random
+import statistics
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.models import Count, Max
+from django.test import Client, RequestFactory, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.asgi import WsgiToAsgi
+
+from .constants import BENCHMARK_ZIPF_EXPONENT
+from .dump import finish_import, import_rows
+from .models import Follow, Group, Post, Profile, User
+from .page_cache import bump_generation
+
+# Значения по умолчанию самой SQLite для PRAGMA из SQLITE_PRAGMAS
+SQLITE_DEFAULT_PRAGMAS = {
+    'journal_mode': 'DELETE',
+    'synchronous': 'FULL',
+    'mmap_size': 0,
+    'cache_size': -2000,
+    'temp_store': 'DEFAULT',
+}
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+WORDS = (
+    'котик', 'новости', 'погода', 'город', 'лето', 'зима', 'книга',
+    'фильм', 'музыка', 'прогулка', 'работа', 'отпуск', 'море', 'горы',
+    'друзья', 'вечер', 'утро', 'кофе', 'код', 'python', 'django',
+)
+
+
+def _next_pk(model):
+    return (model.objects.aggregate(pk=Max('pk'))['pk'] or 0) + 1
+
+
+def _zipf_weights(count):
+    return list(itertools.accumulate(
+        1 / rank ** BENCHMARK_ZIPF_EXPONENT for rank in range(1, count + 1)
+    ))
+
+
+def _save(label, rows, batch_size, progress):
+    saved = 0
+    for batch in iter(lambda: list(itertools.islice(rows, batch_size)), []):
+        import_rows(label, batch)
+        saved += len(batch)
+        progress(label, saved)
+
+
+def synthesize(users, posts, groups, follows, batch_size, seed=None,
+               days=365, progress=lambda label, saved: None):
+    '''
+    Добавляет в базу users пользователей, groups групп, posts постов
+    за последние days дней и в среднем follows подписок на пользователя.
+    '''
+    rng = random.Random(seed)
+    now = timezone.now()
+    first_user, first_group = _next_pk(User), _next_pk(Group)
+    first_post = _next_pk(Post)
+    user_ids = range(first_user, first_user + users)
+    group_ids = range(first_group, first_group + groups)
+    weights = _zipf_weights(users)
+
+    _save('user', ({
+        'model': 'user', 'pk': pk, 'fields': {
+            'username': f'bench_{pk}', 'password': '!',
+            'first_name': 'Bench', 'last_name': str(pk),
+            'date_joined': now,
+        }
+    } for pk in user_ids), batch_size, progress)
+    _save('group', ({
+        'model': 'group', 'pk': pk, 'fields': {
+            'title': f'Группа {pk}', 'slug': f'bench-{pk}',
+            'description': 'Синтетическая группа',
+        }
+    } for pk in group_ids), batch_size, progress)
+
+    def post_rows():
+        for pk in range(first_post, first_post + posts):
+            pub_date = now - timedelta(seconds=rng.uniform(0, days * 86400))
+            yield {'model': 'post', 'pk': pk, 'fields': {
+                'text': ' '.join(rng.choices(WORDS, k=rng.randint(5, 40))),
+                'pub_date': pub_date,
+                'updated_at': pub_date,
+                'author_id': rng.choices(user_ids, cum_weights=weights)[0],
+                'group_id': (rng.choice(group_ids)
+                             if group_ids and rng.random() < 0.5 else None),
+                'image': '',
+            }}
+    _save('post', post_rows(), batch_size, progress)
+
+    def follow_rows():
+        pk = _next_pk(Follow)
+        for user_id in user_ids:
+            count = min(int(rng.expovariate(1 / follows)) if follows else 0,
+                        users - 1)
+            authors = set(rng.choices(user_ids, cum_weights=weights,
+                                      k=count))
+            authors.discard(user_id)
+            for author_id in sorted(authors):
+                yield {'model': 'follow', 'pk': pk, 'fields': {
+                    'user_id': user_id, 'author_id': author_id,
+                }}
+                pk += 1
+    _save('follow', follow_rows(), batch_size, progress)
+    finish_import()
+
+
+class QueryCounter:
+    '''Считает SQL-запросы, выполненные внутри execute_wrapper.'''
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def get_targets(samples=100):
+    '''
+    Возвращает пользователя, от имени которого идут запросы, и адреса
+    страниц: самые большие группа, профиль и лента подписок и случайные
+    посты. Для каждой страницы - список адресов, которые перебираются
+    по кругу.
+    '''
+    reader = Profile.objects.select_related('user').order_by(
+        '-following_count').first()
+    author = Profile.objects.select_related('user').order_by(
+        '-posts_count').first()
+    group = Group.objects.annotate(size=Count('posts')).order_by(
+        '-size').first()
+    post_ids = list(Post.objects.order_by('?').values_list(
+        'pk', flat=True)[:samples])
+    targets = {'posts:index': [reverse('posts:index')]}
+    if group is not None:
+        targets['posts:group_list'] = [
+            reverse('posts:group_list', kwargs={'slug': group.slug})]
+    if author is not None:
+        targets['posts:profile'] = [reverse(
+            'posts:profile', kwargs={'username': author.user.username})]
+    if post_ids:
+        targets['posts:post_detail'] = [
+            reverse('posts:post_detail', kwargs={'post_id': pk})
+            for pk in post_ids]
+    if reader is not None:
+        targets['posts:follow_index'] = [reverse('posts:follow_index')]
+    return (reader.user if reader else None), targets
+
+
+def _peak_rss():
+    '''Пиковый объем памяти процесса в КБ (в Linux ru_maxrss - в КБ).'''
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _fetch_local(client, path):
+    counter = QueryCounter()
+    with connection.execute_wrapper(counter):
+        response = client.get(path)
+    if response.status_code != 200:
+        raise RuntimeError(f'{path}: код ответа {response.status_code}')
+    return counter.count
+
+
+def _fetch_remote(base_url, path):
+    with urllib.request.urlopen(base_url.rstrip('/') + path) as response:
+        response.read()
+    return None
+
+
+def _percentiles(timings):
+    # Линейная интерполяция между соседними замерами, как
+    # statistics.quantiles(method='inclusive'), которого нет в Python 3.7
+    ordered = sorted(timings)
+    result = {}
+    for percent in (50, 95, 99):
+        position = (len(ordered) - 1) * percent / 100
+        lower = int(position)
+        upper = min(lower + 1, len(ordered) - 1)
+        value = ordered[lower] + (
+            ordered[upper] - ordered[lower]) * (position - lower)
+        result[f'p{percent}'] = round(value, 2)
+    return result
+
+
+def run(requests, warmup=5, base_url=None, bypass_cache=False):
+    '''
+    Замеряет страницы из get_targets(). Возвращает словарь
+    {имя страницы: {'requests', 'p50', 'p95', 'p99', 'queries', 'rss'}},
+    время - в миллисекундах. С base_url запросы идут по HTTP
+    к запущенному серверу анонимно: ленту подписок и число запросов
+    к БД в этом режиме не замерить.
+    '''
+    user, targets = get_targets()
+    if base_url is not None:
+        targets.pop('posts:follow_index', None)
+
+        def fetch(path):
+            return _fetch_remote(base_url, path)
+    else:
+        client = Client()
+        if user is not None:
+            client.force_login(user)
+
+        def fetch(path):
+            return _fetch_local(client, path)
+
+    results = {}
+    for name, paths in targets.items():
+        paths = itertools.cycle(paths)
+        for _ in range(warmup):
+            fetch(next(paths))
+        timings, queries = [], []
+        for _ in range(requests):
+            if bypass_cache:
+                bump_generation()
+            started = time.perf_counter()
+            count = fetch(next(paths))
+            timings.append((time.perf_counter() - started) * 1000)
+            queries.append(count)
+        results[name] = {
+            'requests': requests,
+            **_percentiles(timings),
+            'queries': (None if base_url is not None
+                        else round(statistics.mean(queries), 1)),
+            'rss': None if base_url is not None else _peak_rss(),
+        }
+    return results
+
+
+def _summary(timings, elapsed):
+    return {
+        'requests': len(timings),
+        **_percentiles(timings),
+        'queries': None,
+        'rss': _peak_rss(),
+        'rps': round(len(timings) / elapsed, 1),
+    }
+
+
+def _drive_wsgi(application, paths, cookie, concurrency, bypass_cache):
+    def fetch(path):
+        if bypass_cache:
+            bump_generation()
+        environ = RequestFactory().get(path, HTTP_COOKIE=cookie).environ
+        started = time.perf_counter()
+        result = application(environ, lambda status, headers: None)
+        try:
+            for _ in result:
+                pass
+        finally:
+            result.close()
+        return (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        timings = list(executor.map(fetch, paths))
+    return timings, time.perf_counter() - started
+
+
+async def _drive_asgi(application, paths, cookie, concurrency,
+                      bypass_cache):
+    queue = asyncio.Queue()
+    for path in paths:
+        queue.put_nowait(path)
+    timings = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        pass
+
+    async def worker():
+        while not queue.empty():
+            path = queue.get_nowait()
+            if bypass_cache:
+                bump_generation()
+            started = time.perf_counter()
+            await application({
+                'type': 'http', 'method': 'GET', 'path': path,
+                'query_string': b'', 'http_version': '1.1',
+                'server': ('testserver', 80),
+                'headers': [(b'cookie', cookie.encode())],
+            }, receive, send)
+            timings.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return timings, time.perf_counter() - started
+
+
+def run_concurrent(requests, concurrency, interface='wsgi', warmup=5,
+                   bypass_cache=False):
+    '''
+    Выполняет запросы к страницам из get_targets() по concurrency
+    одновременно через WSGI-приложение Django или ASGI-обертку
+    (interface='asgi'). Кроме времени ответа возвращает
+    пропускную способность rps (запросов в секунду).
+    '''
+    user, targets = get_targets()
+    cookie = ''
+    if user is not None:
+        client = Client()
+        client.force_login(user)
+        cookie = '; '.join(
+            f'{morsel.key}={morsel.value}'
+            for morsel in client.cookies.values())
+    wsgi = get_wsgi_application()
+    asgi = WsgiToAsgi(wsgi, max_workers=concurrency)
+    results = {}
+    try:
+        for name, paths in targets.items():
+            paths = list(itertools.islice(
+                itertools.cycle(paths), warmup + requests))
+            if interface == 'asgi':
+                asyncio.run(_drive_asgi(
+                    asgi, paths[:warmup], cookie, concurrency, False))
+                timings, elapsed = asyncio.run(_drive_asgi(
+                    asgi, paths[warmup:], cookie, concurrency, bypass_cache))
+            else:
+                _drive_wsgi(wsgi, paths[:warmup], cookie, concurrency, False)
+                timings, elapsed = _drive_wsgi(
+                    wsgi, paths[warmup:], cookie, concurrency, bypass_cache)
+            results[name] = _summary(timings, elapsed)
+    finally:
+        asgi.executor.shutdown()
+    return results
+
+
+def _mixed_worker(user, paths, post_ids, requests, write_ratio, seed):
+    rng = random.Random(seed)
+    client = Client()
+    client.force_login(user)
+    timings, errors = [], 0
+    try:
+        for _ in range(requests):
+            started = time.perf_counter()
+            try:
+                if rng.random() < write_ratio:
+                    response = client.post(
+                        reverse('posts:add_comment',
+                                kwargs={'post_id': rng.choice(post_ids)}),
+                        {'text': ' '.join(rng.choices(WORDS, k=10))}
+                    )
+                else:
+                    response = client.get(rng.choice(paths))
+                if response.status_code >= 400:
+                    errors += 1
+            except Exception:
+                errors += 1
+            timings.append((time.perf_counter() - started) * 1000)
+    finally:
+        connection.close()
+    return timings, errors
+
+
+def run_mixed(requests, concurrency, write_ratio, seed=None):
+    '''
+    Смешанная нагрузка: concurrency потоков выполняют по requests
+    запросов, из них доля write_ratio - новые комментарии, остальные -
+    страницы из get_targets(). Ошибки (в том числе "database is
+    locked") считаются в errors.
+    '''
+    user, targets = get_targets()
+    if user is None:
+        raise ValueError('Нет пользователей для замера')
+    paths = [path for paths in targets.values() for path in paths]
+    post_ids = list(Post.objects.values_list('pk', flat=True)[:1000])
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        results = list(executor.map(
+            lambda worker_seed: _mixed_worker(
+                user, paths, post_ids, requests, write_ratio, worker_seed),
+            [rng.random() for _ in range(concurrency)]
+        ))
+    elapsed = time.perf_counter() - started
+    timings = [timing for worker, _ in results for timing in worker]
+    return {**_summary(timings, elapsed),
+            'errors': sum(errors for _, errors in results)}
+
+
+def run_sqlite_profiles(requests, concurrency, write_ratio, seed=None):
+    '''
+    run_mixed() с настройками SQLite по умолчанию ('sqlite:default')
+    и с SQLITE_PRAGMAS и постоянными соединениями ('sqlite:tuned').
+    Режим журнала хранится в файле базы, поэтому замер с настройками
+    проекта идет последним и оставляет базу в режиме WAL.
+    '''
+    database = connections.databases[DEFAULT_DB_ALIAS]
+    if database['ENGINE'] != 'django.db.backends.sqlite3':
+        raise ValueError('Замер настроек SQLite требует базу SQLite')
+    conn_max_age = database.get('CONN_MAX_AGE', 0)
+    profiles = {
+        'sqlite:default': (SQLITE_DEFAULT_PRAGMAS, 0),
+        'sqlite:tuned': (settings.SQLITE_PRAGMAS, conn_max_age or 60),
+    }
+    results = {}
+    try:
+        for name, (pragmas, max_age) in profiles.items():
+            # Настройки соединения применяются при его открытии: потоки
+            # замера открывают новые, соединение этого потока закрывается.
+            connection.close()
+            database['CONN_MAX_AGE'] = max_age
+            with override_settings(SQLITE_PRAGMAS=pragmas):
+                results[name] = run_mixed(
+                    requests, concurrency, write_ratio, seed)
+            connection.close()
+    finally:
+        database['CONN_MAX_AGE'] = conn_max_age
+    return results
+
+
+def compare(results, baseline):
+    '''Возвращает изменение p95 в процентах относительно базовых замеров.'''
+    changes = {}
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base and base.get('p95'):
+            changes[name] = round(
+                (result['p95'] - base['p95']) / base['p95'] * 100, 1)
+    return changes
+
+
+def load_baseline(path):
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def save_baseline(path, results):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(results, file, ensure_ascii=False, indent=2)
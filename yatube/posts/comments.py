@@ -0,0 +1,69 @@
+'''
+Комментарии к посту: страницы по курсору и ветки ответов.
+
+На странице поста выводятся только комментарии к самому посту, от новых
+к старым, по COMMENTS_PER_PAGE за раз; следующие страницы и ответы
+подгружаются отдельными запросами. У ответов хранится материализованный
+путь (Comment.path), поэтому вся ветка комментария - это диапазон путей
+от path до path + '/' ('/' в ASCII идет сразу за разделителем '.'),
+который читается одним запросом по индексу (post, path). Длинные
+ветки читаются порциями: курсор следующей порции - путь последнего
+прочитанного ответа.
+'''
+from django.db.models import Exists, OuterRef
+
+from .constants import (COMMENT_MAX_DEPTH, COMMENT_THREAD_LIMIT,
+                        COMMENTS_PER_PAGE)
+from .models import Comment
+from .utils import CursorPaginator
+
+
+def get_comments_page(post_id, cursor=None):
+    '''
+    Страница комментариев к посту после курсора cursor. У комментариев
+    отмечено has_replies - есть ли на них ответы.
+    '''
+    comments = Comment.objects.filter(
+        post_id=post_id, parent=None
+    ).select_related('author').annotate(
+        has_replies=Exists(Comment.objects.filter(parent=OuterRef('pk')))
+    )
+    return CursorPaginator(
+        comments, COMMENTS_PER_PAGE, field='created'
+    ).get_cursor_page(cursor)
+
+
+def get_thread(comment, after=None):
+    '''
+    Ответы любой вложенности на комментарий в порядке обхода ветки,
+    по COMMENT_THREAD_LIMIT за раз, начиная после пути after.
+    Возвращает ответы и курсор следующей порции (путь последнего
+    ответа) или None, если ветка закончилась.
+    '''
+    start = comment.path
+    if after and after.startswith(comment.path + Comment.PATH_SEPARATOR):
+        start = after
+    end = comment.path + chr(ord(Comment.PATH_SEPARATOR) + 1)
+    replies = list(Comment.objects.filter(
+        post_id=comment.post_id, path__gt=start, path__lt=end
+    ).select_related('author').order_by('path')[:COMMENT_THREAD_LIMIT + 1])
+    if len(replies) <= COMMENT_THREAD_LIMIT:
+        return replies, None
+    replies = replies[:COMMENT_THREAD_LIMIT]
+    return replies, replies[-1].path
+
+
+def get_parent(post_id, parent_id):
+    '''
+    Комментарий к посту, на который отвечают, или None. Ответ
+    на комментарий предельной вложенности становится ответом
+    на его родителя.
+    '''
+    if not str(parent_id or '').isdigit():
+        return None
+    parent = Comment.objects.filter(
+        post_id=post_id, pk=parent_id
+    ).select_related('parent').first()
+    if parent is not None and parent.depth >= COMMENT_MAX_DEPTH:
+        return parent.parent
+    return parent
@@ -0,0 +1,104 @@
+'''
+Условные ответы (304) и заголовки кеширования для HTML-страниц.
+
+Валидаторы считаются дешевле самой страницы: поколение кеша страниц
+(меняется с любым постом или группой), состояние комментариев поста,
+счетчики профиля. HTML зависит от пользователя (меню, кнопки подписки,
+форма комментария), поэтому в ETag входит id пользователя, а ответ
+помечается Vary: Cookie. Анонимные ответы можно кешировать в прокси
+на ANON_PAGE_MAX_AGE секунд, ответы пользователям - только в браузере
+с обязательной перепроверкой.
+'''
+from functools import wraps
+
+from django.db.models import Exists, Max, OuterRef
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+from .constants import ANON_PAGE_MAX_AGE
+from .follows import get_following_version
+from .models import Follow, Post, Profile
+from .page_cache import get_changed_at, get_generation
+
+
+def post_state(post_id):
+    '''
+    Возвращает (время изменения, число комментариев, время последнего
+    комментария) поста или None, если поста нет.
+    '''
+    return Post.objects.filter(pk=post_id).order_by().values_list(
+        'updated_at', 'comments_count'
+    ).annotate(last_comment=Max('comments__created')).first()
+
+
+def request_post_state(request, post_id):
+    '''post_state, вычисленный один раз на запрос для ETag и Last-Modified.'''
+    if getattr(request, '_post_state', (None,))[0] != post_id:
+        request._post_state = (post_id, post_state(post_id))
+    return request._post_state[1]
+
+
+def _timestamp(value):
+    return value.timestamp() if value else 0
+
+
+def group_etag(request, slug):
+    # Ссылки на подписку в карточках зависят от подписок читателя
+    following = 0
+    if request.user.is_authenticated:
+        following = get_following_version(request.user.pk)
+    return f'{request.user.pk or 0}-{get_generation()}-{following}'
+
+
+def group_last_modified(request, slug):
+    return get_changed_at()
+
+
+def profile_etag(request, username):
+    following = Follow.objects.filter(
+        user_id=request.user.pk, author_id=OuterRef('user_id'))
+    state = Profile.objects.filter(user__username=username).annotate(
+        following=Exists(following)
+    ).values_list('followers_count', 'following_count', 'following').first()
+    if state is None:
+        return None
+    return '-'.join(
+        map(str, (request.user.pk or 0, get_generation(), *state)))
+
+
+def post_etag(request, post_id):
+    state = request_post_state(request, post_id)
+    if state is None:
+        return None
+    _, comments_count, last_comment = state
+    return (f'{request.user.pk or 0}-{get_generation()}-{comments_count}-'
+            f'{_timestamp(last_comment)}')
+
+
+def post_last_modified(request, post_id):
+    state = request_post_state(request, post_id)
+    if state is None:
+        return None
+    return max(filter(None, (get_changed_at(), state[0], state[2])))
+
+
+def conditional_page(etag_func=None, last_modified_func=None):
+    '''
+    Декоратор view: отвечает 304 по валидаторам и добавляет заголовки
+    Cache-Control и Vary: Cookie.
+    '''
+    def decorator(view):
+        view = condition(etag_func, last_modified_func)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = view(request, *args, **kwargs)
+            if request.user.is_authenticated:
+                patch_cache_control(response, private=True, no_cache=True)
+            else:
+                patch_cache_control(
+                    response, public=True, max_age=ANON_PAGE_MAX_AGE)
+            patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapper
+    return decorator
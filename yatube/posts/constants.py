@@ -2,3 +2,89 @@
 
 # Количество постов, отображаемых на странице
 NUMBER_POST_PER_PAGE: int = 10
+
+# Авторы, у которых подписчиков больше этого числа, не рассылают новые
+# посты в материализованные ленты: их посты добавляются в ленту при чтении
+FEED_FANOUT_MAX_FOLLOWERS: int = 1000
+
+# Размер пачки при массовой вставке записей ленты
+FEED_BATCH_SIZE: int = 500
+
+# Сколько секунд держится блокировка пересчета страницы в кеше
+# и как часто (в секундах) ожидающий запрос проверяет готовность страницы
+PAGE_CACHE_LOCK_TIMEOUT: int = 10
+PAGE_CACHE_WAIT: float = 0.05
+
+# Размеры миниатюр картинок постов и их параметры для sorl.thumbnail.
+# Должны совпадать с тегами {% thumbnail %} в шаблонах.
+THUMBNAIL_SIZES: dict = {
+    '960x339': {'crop': 'center', 'upscale': True},
+}
+
+# Количество процессов обработчика заданий на миниатюры, сколько заданий
+# он забирает за раз и пауза (в секундах) между проверками очереди
+THUMBNAIL_WORKERS: int = 2
+THUMBNAIL_BATCH_SIZE: int = 20
+THUMBNAIL_POLL_INTERVAL: float = 2.0
+# Через сколько секунд задание в состоянии RUNNING считается брошенным
+# (обработчик завершился, не закончив его) и забирается снова
+THUMBNAIL_LEASE: int = 600
+
+# Ширины адаптивных вариантов картинки поста, их пропорции (как у
+# миниатюры 960x339) и форматы в порядке предпочтения. Форматы, которые
+# не поддерживает установленный Pillow, пропускаются.
+IMAGE_VARIANT_WIDTHS: tuple = (480, 960, 1440)
+IMAGE_VARIANT_RATIO: float = 339 / 960
+IMAGE_VARIANT_FORMATS: tuple = ('avif', 'webp', 'jpeg')
+
+# Сколько самых релевантных постов выводится в результатах поиска
+# и по сколько постов индексирует за раз команда reindex
+SEARCH_MAX_RESULTS: int = 1000
+SEARCH_BATCH_SIZE: int = 500
+
+# Сколько записей за раз читают из базы и сохраняют команды
+# export_yatube и import_yatube
+DUMP_BATCH_SIZE: int = 1000
+
+# Показатель степени в законе Ципфа для синтетических данных benchmark:
+# чем он больше, тем сильнее посты и подписчики сосредоточены
+# у немногих авторов
+BENCHMARK_ZIPF_EXPONENT: float = 1.1
+
+# Сколько секунд прокси и браузеры могут хранить страницы,
+# отданные анонимным пользователям, без перепроверки
+ANON_PAGE_MAX_AGE: int = 60
+
+# Страницы, которые AnonymousPageCacheMiddleware кеширует для анонимных
+# пользователей, допустимые параметры их адресов и срок хранения
+# (в секундах) для изменений, которые не сбрасывают кеш сразу
+ANON_PAGE_CACHE_VIEWS: tuple = (
+    'posts:index', 'posts:group_list', 'posts:profile', 'posts:post_detail',
+)
+ANON_PAGE_CACHE_PARAMS: tuple = ('page', 'cursor')
+ANON_PAGE_CACHE_TIMEOUT: int = 60
+
+# Сколько ссылок на соседние страницы паджинатор выводит с каждой
+# стороны от текущей
+PAGINATOR_WINDOW: int = 3
+
+# Сколько комментариев к посту выводится за раз, предельная вложенность
+# ответов и сколько ответов ветки читается одним запросом
+COMMENTS_PER_PAGE: int = 20
+COMMENT_MAX_DEPTH: int = 8
+COMMENT_THREAD_LIMIT: int = 500
+
+# Буфер записи (writes.py): сколько комментариев или подписок
+# сохраняется одной транзакцией, сколько секунд пачка ждет новых записей
+# и сколько секунд запрос ждет сохранения своей записи
+WRITE_BATCH_SIZE: int = 100
+WRITE_FLUSH_INTERVAL: float = 0.005
+WRITE_TIMEOUT: int = 10
+
+# Множества подписок и подписчиков пользователя кешируются, если в них
+# не меньше FOLLOW_CACHE_MIN_SIZE человек (маленькие дешевле прочитать
+# из базы), на FOLLOW_CACHE_TIMEOUT секунд; сколько авторов предлагается
+# в рекомендациях подписок
+FOLLOW_CACHE_MIN_SIZE: int = 100
+FOLLOW_CACHE_TIMEOUT: int = 60 * 60
+FOLLOW_SUGGESTIONS: int = 10
@@ -0,0 +1,115 @@
+'''
+Денормализованные счетчики: посты, подписчики и подписки автора
+в Profile, комментарии поста в Post.comments_count.
+Счетчики изменяются атомарно через F-выражения, а команда recount
+пересчитывает их заново, если они разошлись с данными.
+'''
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, Profile, User
+
+
+def _change(queryset, field, delta):
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def count_profile(user_id):
+    '''Считает значения счетчиков автора запросами к исходным таблицам.'''
+    return {
+        'posts_count': Post.objects.filter(author_id=user_id).count(),
+        'followers_count': Follow.objects.filter(author_id=user_id).count(),
+        'following_count': Follow.objects.filter(user_id=user_id).count(),
+    }
+
+
+def get_profile(user):
+    '''Возвращает профиль автора, создавая его при первом обращении.'''
+    try:
+        return Profile.objects.get(user_id=user.pk)
+    except Profile.DoesNotExist:
+        profile, _ = Profile.objects.get_or_create(
+            user_id=user.pk, defaults=count_profile(user.pk)
+        )
+        return profile
+
+
+def ensure_profiles(user_ids):
+    '''
+    Создает недостающие профили с пересчитанными счетчиками. Нужно перед
+    пакетной вставкой: иначе профиль, созданный при первой записи пачки,
+    уже учел бы всю пачку, а остальные записи прибавили бы себя еще раз.
+    '''
+    existing = set(Profile.objects.filter(
+        user_id__in=user_ids).values_list('user_id', flat=True))
+    Profile.objects.bulk_create(
+        (Profile(user_id=user_id, **count_profile(user_id))
+         for user_id in set(user_ids) - existing),
+        ignore_conflicts=True
+    )
+
+
+def change_profile(user_id, field, delta):
+    '''
+    Изменяет счетчик field профиля на delta. Если профиля еще нет,
+    он создается с уже пересчитанными значениями.
+    '''
+    if _change(Profile.objects.filter(user_id=user_id), field, delta):
+        return
+    if delta > 0:
+        Profile.objects.get_or_create(
+            user_id=user_id, defaults=count_profile(user_id)
+        )
+
+
+def change_profiles(user_ids, field, delta):
+    '''Изменяет счетчик field у профилей всех user_ids одним запросом.'''
+    _change(Profile.objects.filter(user_id__in=user_ids), field, delta)
+
+
+def recount_follows(user_ids):
+    '''Пересчитывает счетчики подписок и подписчиков у профилей user_ids.'''
+    Profile.objects.filter(user_id__in=user_ids).update(
+        followers_count=_count(Follow.objects, 'author_id', 'user_id'),
+        following_count=_count(Follow.objects, 'user_id', 'user_id'),
+    )
+
+
+def change_comments(post_id, delta):
+    '''Изменяет счетчик комментариев поста на delta.'''
+    _change(Post.objects.filter(pk=post_id), 'comments_count', delta)
+
+
+def _count(queryset, field, outer='pk'):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef(outer)})
+            .order_by().values(field)
+            .annotate(total=Count('pk')).values('total'),
+            output_field=IntegerField()
+        ),
+        0
+    )
+
+
+def recount():
+    '''
+    Пересчитывает все счетчики. Возвращает количество обновленных
+    профилей и постов.
+    '''
+    missing = User.objects.filter(profile__isnull=True).values_list(
+        'pk', flat=True)
+    Profile.objects.bulk_create(
+        (Profile(user_id=user_id) for user_id in missing.iterator()),
+        batch_size=500
+    )
+    profiles = Profile.objects.update(
+        posts_count=_count(Post.objects, 'author_id', 'user_id'),
+        followers_count=_count(Follow.objects, 'author_id', 'user_id'),
+        following_count=_count(Follow.objects, 'user_id', 'user_id'),
+    )
+    posts = Post.objects.update(
+        comments_count=_count(Comment.objects, 'post_id'))
+    return profiles, posts
@@ -0,0 +1,124 @@
+'''
+Выгрузка и загрузка данных в формате NDJSON: одна строка - один объект
+вида {"model": "post", "pk": 1, "fields": {...}}. Модели выгружаются
+в порядке DUMP_MODELS, чтобы при загрузке связанные объекты уже были
+в базе.
+
+Загрузка идет пачками через bulk_create с сохранением первичных ключей,
+поэтому сигналы не срабатывают: счетчики, поисковый индекс и кеш
+страниц обновляются отдельно (см. import_rows и finish_import).
+Уже существующие записи пропускаются, и загрузку можно повторять.
+'''
+import datetime
+import json
+
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+
+from . import search
+from .counters import recount
+from .models import Comment, Follow, Group, Post, User
+from .page_cache import bump_generation
+
+DUMP_MODELS = {
+    'user': (User, (
+        'username', 'password', 'first_name', 'last_name', 'email',
+        'is_active', 'is_staff', 'is_superuser', 'date_joined',
+        'last_login',
+    )),
+    'group': (Group, ('title', 'slug', 'description')),
+    'post': (Post, (
+        'text', 'pub_date', 'updated_at', 'author_id', 'group_id',
+        'image', 'image_ready', 'image_variants',
+    )),
+    'comment': (Comment, (
+        'text', 'created', 'post_id', 'author_id', 'parent_id', 'path',
+    )),
+    'follow': (Follow, ('user_id', 'author_id')),
+}
+
+
+class DumpEncoder(DjangoJSONEncoder):
+    '''В отличие от DjangoJSONEncoder не отбрасывает микросекунды.'''
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def dumps(row):
+    return json.dumps(row, cls=DumpEncoder, ensure_ascii=False)
+
+
+def export_rows(chunk_size):
+    '''Перебирает все выгружаемые объекты, читая их из базы частями.'''
+    for label, (model, fields) in DUMP_MODELS.items():
+        rows = model.objects.order_by('pk').values_list('pk', *fields)
+        for pk, *values in rows.iterator(chunk_size=chunk_size):
+            yield {
+                'model': label,
+                'pk': pk,
+                'fields': dict(zip(fields, values)),
+            }
+
+
+def _date_fields(model):
+    # Поля с auto_now и auto_now_add получают при вставке текущее время
+    return [
+        field.attname for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False)
+        or getattr(field, 'auto_now_add', False)
+    ]
+
+
+def import_rows(label, rows):
+    '''Сохраняет пачку объектов одной модели.'''
+    model, fields = DUMP_MODELS[label]
+    objects = []
+    for row in rows:
+        values = {
+            name: model._meta.get_field(name).to_python(value)
+            for name, value in row['fields'].items() if name in fields
+        }
+        obj = model(pk=row['pk'], **values)
+        if model is Comment and not obj.path and obj.parent_id is None:
+            # В выгрузках до появления веток путей нет
+            obj.path = obj.build_path()
+        objects.append(obj)
+    existing = set(model.objects.filter(
+        pk__in=[obj.pk for obj in objects]).values_list('pk', flat=True))
+    new = [obj for obj in objects if obj.pk not in existing]
+    date_fields = _date_fields(model)
+    dates = [
+        {name: getattr(obj, name) for name in date_fields} for obj in new
+    ]
+    model.objects.bulk_create(new, ignore_conflicts=True)
+    if date_fields:
+        # Даты из выгрузки записываются отдельным запросом, а не
+        # отключением auto_now у полей: поля модели общие для всех
+        # потоков процесса.
+        for obj, values in zip(new, dates):
+            for name, value in values.items():
+                if value is not None:
+                    setattr(obj, name, value)
+        model.objects.bulk_update(new, date_fields)
+    if model is Post:
+        # Пропущенные bulk_create записи остаются с текстом из базы,
+        # поэтому текст для индекса читается оттуда, а не из выгрузки.
+        search.index_posts(model.objects.filter(
+            pk__in=[post.pk for post in objects]
+        ).values_list('pk', 'text'))
+
+
+def finish_import():
+    '''Обновляет все, что не изменилось при загрузке из-за bulk_create.'''
+    models = [model for model, _ in DUMP_MODELS.values()]
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+    recount()
+    bump_generation()
@@ -0,0 +1,87 @@
+'''
+Материализованные ленты подписок.
+
+Новый пост рассылается в ленты подписчиков автора (fan-out-on-write):
+для каждого подписчика создается запись FeedEntry. У авторов с большим
+числом подписчиков (больше FEED_FANOUT_MAX_FOLLOWERS) рассылка не
+выполняется, такие посты остаются с fanned_out=False и добавляются
+в ленту при чтении (fan-out-on-read).
+
+Здесь же собирается общий queryset для страниц со списками постов.
+'''
+from django.db.models import Q
+
+from .constants import FEED_BATCH_SIZE, FEED_FANOUT_MAX_FOLLOWERS
+from .models import FeedEntry, Follow, Post
+
+# Поля, которые выводятся в карточке поста и в link_bar.html
+FEED_FIELDS = (
+    'text', 'pub_date', 'updated_at', 'image', 'image_ready',
+    'image_variants', 'comments_count', 'author', 'group',
+    'author__username', 'author__first_name', 'author__last_name',
+    'group__slug', 'group__title',
+)
+
+
+def build_feed(queryset):
+    '''
+    Дополняет queryset постов всем, что нужно шаблонам: автор и группа
+    загружаются одним JOIN, из таблиц выбираются только выводимые поля.
+    Комментарии выводятся страницами, см. comments.py.
+    '''
+    return queryset.select_related('author', 'group').only(*FEED_FIELDS)
+
+
+def _bulk_insert(entries):
+    FeedEntry.objects.bulk_create(
+        entries, batch_size=FEED_BATCH_SIZE, ignore_conflicts=True
+    )
+
+
+def fan_out_post(post):
+    '''Рассылает новый пост в ленты подписчиков его автора.'''
+    followers = Follow.objects.filter(author_id=post.author_id)
+    if followers.count() > FEED_FANOUT_MAX_FOLLOWERS:
+        return
+    user_ids = followers.values_list('user_id', flat=True).distinct()
+    _bulk_insert(
+        FeedEntry(user_id=user_id, post_id=post.pk)
+        for user_id in user_ids.iterator()
+    )
+    Post.objects.filter(pk=post.pk).update(fanned_out=True)
+    post.fanned_out = True
+
+
+def backfill(user_id, author_id):
+    '''Добавляет в ленту нового подписчика разосланные посты автора.'''
+    post_ids = Post.objects.filter(
+        author_id=author_id, fanned_out=True
+    ).values_list('pk', flat=True)
+    _bulk_insert(
+        FeedEntry(user_id=user_id, post_id=post_id)
+        for post_id in post_ids.iterator()
+    )
+
+
+def prune(user_id, author_ids):
+    '''Удаляет посты авторов из ленты отписавшегося пользователя.'''
+    FeedEntry.objects.filter(
+        user_id=user_id, post__author_id__in=author_ids
+    ).exclude(
+        post__author_id__in=Follow.objects.filter(
+            user_id=user_id).values('author_id')
+    ).delete()
+
+
+def get_follow_feed(user):
+    '''
+    Возвращает посты ленты подписок: записи материализованной ленты
+    и неразосланные посты авторов, на которых подписан пользователь.
+    '''
+    return Post.objects.filter(
+        Q(pk__in=FeedEntry.objects.filter(
+            user=user).values('post_id'))
+        | Q(fanned_out=False,
+            author_id__in=Follow.objects.filter(
+                user=user).values('author_id'))
+    )
@@ -0,0 +1,190 @@
+'''
+Граф подписок: операции над множествами подписок одним запросом.
+
+Массовые подписка и отписка не перебирают записи Follow по одной:
+подписки вставляются одним bulk_create (см. writes.save_follows),
+а любое удаление подписок через Follow.objects (в том числе удаление
+одной записи) - одним DELETE, после которого счетчики профилей и ленты
+обновляются запросами по всему множеству пользователей сразу.
+
+Множества подписок и подписчиков популярных пользователей хранятся
+в кеше и сбрасываются при каждом изменении их подписок. Ключи кеша
+начинаются с FOLLOWS_KEY и читаются мимо локального уровня NearCache,
+поэтому изменение сразу видно во всех процессах.
+'''
+import time
+from collections import Counter, defaultdict
+
+from django.core.cache import cache
+from django.db.models import Count
+
+from core.db import retry_on_busy
+
+from .constants import (FOLLOW_CACHE_MIN_SIZE, FOLLOW_CACHE_TIMEOUT,
+                        FOLLOW_SUGGESTIONS)
+from .counters import change_profiles, recount_follows
+from .feed import prune
+from .models import Follow
+from .writes import save_follows
+
+FOLLOWS_KEY = 'posts:follows'
+
+
+def _following_key(user_id):
+    return f'{FOLLOWS_KEY}:following:{user_id}'
+
+
+def _followers_key(user_id):
+    return f'{FOLLOWS_KEY}:followers:{user_id}'
+
+
+def _version_key(user_id):
+    return f'{FOLLOWS_KEY}:version:{user_id}'
+
+
+def _cached_ids(key, queryset):
+    ids = cache.get(key)
+    if ids is None:
+        ids = frozenset(queryset)
+        if len(ids) >= FOLLOW_CACHE_MIN_SIZE:
+            cache.set(key, ids, FOLLOW_CACHE_TIMEOUT)
+    return ids
+
+
+def get_following(user_id):
+    '''id авторов, на которых подписан пользователь.'''
+    return _cached_ids(
+        _following_key(user_id),
+        Follow.objects.filter(user_id=user_id).values_list(
+            'author_id', flat=True)
+    )
+
+
+def get_followers(user_id):
+    '''id подписчиков автора.'''
+    return _cached_ids(
+        _followers_key(user_id),
+        Follow.objects.filter(author_id=user_id).values_list(
+            'user_id', flat=True)
+    )
+
+
+def request_following(request):
+    '''
+    get_following текущего пользователя, прочитанный один раз за запрос:
+    сколько бы авторов ни было на странице, проверка подписки на каждого
+    не обращается к базе.
+    '''
+    if not hasattr(request, '_following'):
+        user = request.user
+        request._following = (
+            get_following(user.pk) if user.is_authenticated else frozenset()
+        )
+    return request._following
+
+
+def get_following_version(user_id):
+    '''
+    Версия подписок пользователя: меняется с каждой его подпиской или
+    отпиской. Входит в ключ закешированных для него страниц.
+    '''
+    return cache.get(_version_key(user_id), 0)
+
+
+def forget(user_ids=(), author_ids=()):
+    '''Сбрасывает закешированные подписки user_ids и подписчиков author_ids.'''
+    cache.delete_many(
+        [_following_key(user_id) for user_id in user_ids]
+        + [_followers_key(author_id) for author_id in author_ids]
+    )
+    for user_id in user_ids:
+        key = _version_key(user_id)
+        if not cache.add(key, int(time.time() * 1000), None):
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.add(key, int(time.time() * 1000), None)
+
+
+def follow_many(user_id, author_ids):
+    '''Подписывает пользователя на авторов; возвращает число новых подписок.'''
+    created = save_follows([
+        Follow(user_id=user_id, author_id=author_id)
+        for author_id in set(author_ids) - {user_id}
+    ])
+    return sum(created)
+
+
+def unfollow_many(user_id, author_ids):
+    '''Отписывает пользователя от авторов; возвращает число отписок.'''
+    deleted, _ = Follow.objects.filter(
+        user_id=user_id, author_id__in=author_ids
+    ).delete()
+    return deleted
+
+
+def _change_by_count(user_ids, field):
+    # Одним запросом на каждое встретившееся число удаленных подписок
+    by_count = defaultdict(list)
+    for user_id, count in Counter(user_ids).items():
+        by_count[count].append(user_id)
+    for count, ids in by_count.items():
+        change_profiles(ids, field, -count)
+
+
+@retry_on_busy
+def _delete_follows(follows, pairs):
+    deleted = follows.delete_rows()
+    user_ids = [user_id for user_id, _ in pairs]
+    author_ids = [author_id for _, author_id in pairs]
+    if deleted[0] == len(pairs):
+        _change_by_count(author_ids, 'followers_count')
+        _change_by_count(user_ids, 'following_count')
+    else:
+        # Часть подписок успел удалить другой запрос, и какие именно
+        # удалены этим, неизвестно: счетчики пересчитываются заново.
+        recount_follows({*user_ids, *author_ids})
+    removed = defaultdict(list)
+    for user_id, author_id in pairs:
+        removed[user_id].append(author_id)
+    for user_id, authors in removed.items():
+        prune(user_id, authors)
+    return deleted
+
+
+def delete_follows(follows):
+    '''
+    Удаляет подписки queryset одним DELETE и обновляет счетчики и ленты
+    запросами по всем затронутым пользователям сразу. Вызывается из
+    Follow.objects.filter(...).delete() и возвращает то же, что он.
+    '''
+    pairs = list(follows.values_list('user_id', 'author_id'))
+    if not pairs:
+        return 0, {}
+    deleted = _delete_follows(follows, pairs)
+    forget({user_id for user_id, _ in pairs},
+           {author_id for _, author_id in pairs})
+    return deleted
+
+
+def mutual_follows(user_id):
+    '''id пользователей, подписанных друг на друга с пользователем.'''
+    return get_following(user_id) & get_followers(user_id)
+
+
+def suggestions(user_id, limit=FOLLOW_SUGGESTIONS):
+    '''
+    Авторы, на которых подписаны авторы из подписок пользователя, от
+    самых популярных среди них. Возвращает список (id автора, сколько
+    подписок пользователя на него подписаны).
+    '''
+    following = Follow.objects.filter(user_id=user_id).values('author_id')
+    return list(
+        Follow.objects.filter(user_id__in=following)
+        .exclude(author_id__in=following)
+        .exclude(author_id=user_id)
+        .values('author_id')
+        .annotate(mentions=Count('pk'))
+        .order_by('-mentions', 'author_id')
+        .values_list('author_id', 'mentions')[:limit]
+    )
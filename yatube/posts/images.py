@@ -0,0 +1,88 @@
+'''
+Адаптивные варианты картинок постов.
+
+Для каждой картинки создаются копии нескольких ширин в нескольких
+форматах. Они лежат рядом с оригиналом в MEDIA_ROOT/posts/ с именами
+вида <имя>_<ширина>w.<расширение> и выводятся в шаблонах тегом
+picture с атрибутами srcset. Созданные варианты записываются в
+Post.image_variants, и srcset строится только из них: набор форматов
+Pillow или настройки могли измениться после обработки картинки.
+'''
+import io
+import os
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from .constants import (IMAGE_VARIANT_FORMATS, IMAGE_VARIANT_RATIO,
+                        IMAGE_VARIANT_WIDTHS)
+
+FORMATS = {
+    'avif': ('AVIF', 'image/avif', 'avif'),
+    'webp': ('WEBP', 'image/webp', 'webp'),
+    'jpeg': ('JPEG', 'image/jpeg', 'jpg'),
+}
+
+
+def available_formats():
+    '''Форматы вариантов, которые умеет сохранять установленный Pillow.'''
+    Image.init()
+    return [fmt for fmt in IMAGE_VARIANT_FORMATS
+            if FORMATS[fmt][0] in Image.SAVE]
+
+
+def variant_name(name, width, fmt):
+    root, _ = os.path.splitext(name)
+    return f'{root}_{width}w.{FORMATS[fmt][2]}'
+
+
+def generate_variants(image_field):
+    '''Создает все варианты картинки и возвращает пары (формат, ширина).'''
+    with image_field.open('rb') as source:
+        original = Image.open(source)
+        original.load()
+    original = original.convert('RGB')
+    variants = []
+    for width in IMAGE_VARIANT_WIDTHS:
+        size = (width, round(width * IMAGE_VARIANT_RATIO))
+        resized = ImageOps.fit(original, size, Image.LANCZOS)
+        for fmt in available_formats():
+            buffer = io.BytesIO()
+            resized.save(buffer, FORMATS[fmt][0], quality=80)
+            name = variant_name(image_field.name, width, fmt)
+            default_storage.delete(name)
+            default_storage.save(name, ContentFile(buffer.getvalue()))
+            variants.append((fmt, width))
+    return variants
+
+
+def format_variants(variants):
+    '''Значение Post.image_variants: "формат:ширина" через пробел.'''
+    return ' '.join(f'{fmt}:{width}' for fmt, width in variants)
+
+
+def image_sources(image_field, variants):
+    '''
+    Описания тегов source: MIME-тип и srcset для каждого формата
+    из записанных в variants (см. format_variants).
+    '''
+    widths = {}
+    for variant in variants.split():
+        fmt, width = variant.split(':')
+        if fmt in FORMATS:
+            widths.setdefault(fmt, []).append(int(width))
+    return [
+        {
+            'type': FORMATS[fmt][1],
+            'srcset': ', '.join(
+                '{} {}w'.format(
+                    default_storage.url(
+                        variant_name(image_field.name, width, fmt)),
+                    width
+                )
+                for width in sorted(fmt_widths)
+            ),
+        }
+        for fmt, fmt_widths in widths.items()
+    ]
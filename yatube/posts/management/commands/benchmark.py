@@ -0,0 +1,126 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from posts.benchmark import (compare, load_baseline, run, run_concurrent,
+                             run_sqlite_profiles, save_baseline)
+
+
+class Command(BaseCommand):
+    help = ('Замеряет время ответа (p50/p95/p99, мс), число SQL-запросов '
+            'и пиковый объем памяти для основных страниц posts.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=100,
+            help='Сколько запросов к каждой странице замерять.'
+        )
+        parser.add_argument(
+            '--warmup', type=int, default=5,
+            help='Сколько запросов сделать до замеров.'
+        )
+        parser.add_argument(
+            '--url',
+            help=('Адрес запущенного сервера, например '
+                  'http://127.0.0.1:8000; без него запросы идут '
+                  'через тестовый клиент.')
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=1,
+            help=('Сколько запросов выполнять одновременно; больше 1 - '
+                  'замер пропускной способности в текущем процессе.')
+        )
+        parser.add_argument(
+            '--interface', choices=('wsgi', 'asgi'), default='wsgi',
+            help='Через какую точку входа выполнять параллельные запросы.'
+        )
+        parser.add_argument(
+            '--write-ratio', type=float, default=None,
+            help=('Смешанная нагрузка с такой долей записей (новых '
+                  'комментариев): сравнить настройки SQLite по умолчанию '
+                  'и настройки проекта. --requests - запросов на поток.')
+        )
+        parser.add_argument(
+            '--bypass-cache', action='store_true',
+            help='Сбрасывать кеш страниц перед каждым запросом.'
+        )
+        parser.add_argument(
+            '--baseline', help='Файл с базовыми замерами для сравнения.'
+        )
+        parser.add_argument(
+            '--save-baseline', help='Сохранить замеры в файл.'
+        )
+        parser.add_argument(
+            '--max-regression', type=float, default=None,
+            help=('Завершиться с ошибкой, если p95 хуже базового '
+                  'больше чем на столько процентов.')
+        )
+
+    # Журнал SQL-запросов обходит стек на каждый запрос и искажает замеры
+    @override_settings(QUERY_LOG_SAMPLE_RATE=0)
+    def handle(self, *args, **options):
+        if options['requests'] < 2:
+            raise CommandError('Нужно не меньше двух запросов.')
+        if options['write_ratio'] is not None:
+            results = self.run_sqlite(options)
+        elif options['concurrency'] > 1 or options['interface'] == 'asgi':
+            if options['url']:
+                raise CommandError(
+                    '--concurrency и --interface не работают с --url.')
+            results = run_concurrent(
+                options['requests'], options['concurrency'],
+                interface=options['interface'], warmup=options['warmup'],
+                bypass_cache=options['bypass_cache'],
+            )
+        else:
+            results = run(
+                options['requests'], warmup=options['warmup'],
+                base_url=options['url'],
+                bypass_cache=options['bypass_cache'],
+            )
+        changes = {}
+        if options['baseline']:
+            changes = compare(results, load_baseline(options['baseline']))
+        self.write_table(results, changes)
+        if options['save_baseline']:
+            save_baseline(options['save_baseline'], results)
+        limit = options['max_regression']
+        regressions = [
+            name for name, change in changes.items()
+            if limit is not None and change > limit
+        ]
+        if regressions:
+            raise CommandError(
+                f'p95 ухудшилось больше чем на {limit}%: '
+                f'{", ".join(regressions)}')
+
+    def write_table(self, results, changes):
+        self.stdout.write(
+            f'{"страница":<20}{"p50":>9}{"p95":>9}{"p99":>9}'
+            f'{"запросов":>10}{"RSS, КБ":>10}{"rps":>9}{"p95, %":>9}')
+        for name, result in results.items():
+            change = changes.get(name)
+            self.stdout.write(
+                f'{name:<20}{result["p50"]:>9.2f}{result["p95"]:>9.2f}'
+                f'{result["p99"]:>9.2f}{_show(result["queries"]):>10}'
+                f'{_show(result["rss"]):>10}'
+                f'{_show(result.get("rps")):>9}'
+                f'{"" if change is None else f"{change:+.1f}":>9}')
+        for name, result in results.items():
+            if result.get('errors'):
+                self.stderr.write(f'{name}: ошибок {result["errors"]}')
+
+    def run_sqlite(self, options):
+        if not 0 <= options['write_ratio'] <= 1:
+            raise CommandError('--write-ratio должно быть от 0 до 1.')
+        if options['url']:
+            raise CommandError('--write-ratio не работает с --url.')
+        try:
+            return run_sqlite_profiles(
+                options['requests'], options['concurrency'],
+                options['write_ratio'])
+        except ValueError as error:
+            raise CommandError(error)
+
+
+def _show(value):
+    return '-' if value is None else str(value)
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from posts.benchmark import synthesize
+from posts.constants import DUMP_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = ('Наполняет базу синтетическими пользователями, группами, '
+            'постами и подписками для нагрузочных замеров.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='Среднее число подписок пользователя.'
+        )
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument(
+            '--batch-size', type=int, default=DUMP_BATCH_SIZE,
+            help='Сколько объектов сохранять за раз.'
+        )
+
+    def handle(self, *args, **options):
+        def progress(label, saved):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{label}: {saved}')
+
+        synthesize(
+            users=options['users'], posts=options['posts'],
+            groups=options['groups'], follows=options['follows'],
+            batch_size=options['batch_size'], seed=options['seed'],
+            progress=progress,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Добавлено пользователей: {options["users"]}, '
+            f'постов: {options["posts"]}'))
@@ -0,0 +1,106 @@
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.urls import reverse
+
+from posts import views
+from posts.models import Follow, Group, Post
+
+
+class QueryCollector:
+    '''Запоминает SQL-запросы, выполненные во время работы view.'''
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+
+def explain(sql, params):
+    '''
+    Возвращает план выполнения запроса и признак полного просмотра
+    таблицы. Полным просмотром считается SCAN без индекса в SQLite
+    и Seq Scan в PostgreSQL.
+    '''
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = [row[-1] for row in cursor.fetchall()]
+            full_scan = any(
+                line.startswith('SCAN') and 'INDEX' not in line
+                for line in plan
+            )
+        else:
+            cursor.execute(f'EXPLAIN {sql}', params)
+            plan = [' '.join(map(str, row)) for row in cursor.fetchall()]
+            full_scan = any('Seq Scan' in line for line in plan)
+    return plan, full_scan
+
+
+class Command(BaseCommand):
+    help = ('Выполняет EXPLAIN для запросов основных страниц приложения '
+            'posts и отмечает полные просмотры таблиц.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fail-on-scan', action='store_true',
+            help='Завершиться с ошибкой, если найден полный просмотр.'
+        )
+
+    def get_targets(self):
+        '''Собирает (имя url, view, kwargs, пользователь) по данным БД.'''
+        post = Post.objects.select_related('author', 'group').first()
+        if post is None:
+            return []
+        anonymous = AnonymousUser()
+        targets = [
+            ('posts:index', views.index, {}, anonymous),
+            ('posts:profile', views.profile,
+             {'username': post.author.username}, anonymous),
+            ('posts:post_detail', views.post_detail,
+             {'post_id': post.id}, anonymous),
+        ]
+        group = post.group or Group.objects.first()
+        if group is not None:
+            targets.append(('posts:group_list', views.group_posts,
+                            {'slug': group.slug}, anonymous))
+        follow = Follow.objects.select_related('user').first()
+        if follow is not None:
+            targets.append(('posts:follow_index', views.follow_index,
+                            {}, follow.user))
+        return targets
+
+    def handle(self, *args, **options):
+        factory = RequestFactory()
+        full_scans = 0
+        targets = self.get_targets()
+        if not targets:
+            self.stdout.write('Нет постов для анализа.')
+            return
+        for name, view, kwargs, user in targets:
+            request = factory.get(reverse(name, kwargs=kwargs))
+            request.user = user
+            collector = QueryCollector()
+            # Страницы под cache_page вызываются в обход кеша.
+            view = getattr(view, '__wrapped__', view)
+            with connection.execute_wrapper(collector):
+                view(request, **kwargs)
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{name}: запросов {len(collector.queries)}'))
+            selects = {}
+            for sql, params in collector.queries:
+                if sql.lstrip().upper().startswith('SELECT'):
+                    selects.setdefault(sql, [params, 0])[1] += 1
+            for sql, (params, repeats) in selects.items():
+                plan, full_scan = explain(sql, params)
+                full_scans += full_scan
+                style = self.style.ERROR if full_scan else self.style.SUCCESS
+                self.stdout.write(f'  [x{repeats}] {sql}')
+                for line in plan:
+                    self.stdout.write(style(f'    {line}'))
+        if full_scans and options['fail_on_scan']:
+            raise CommandError(f'Полных просмотров таблиц: {full_scans}')
+        self.stdout.write(f'Полных просмотров таблиц: {full_scans}')
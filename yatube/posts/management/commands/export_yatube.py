@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand, OutputWrapper
+
+from posts.constants import DUMP_BATCH_SIZE
+from posts.dump import dumps, export_rows
+
+
+class Command(BaseCommand):
+    help = ('Выгружает пользователей, группы, посты, комментарии '
+            'и подписки в формате NDJSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'output', nargs='?', default='-',
+            help='Файл для выгрузки; по умолчанию - стандартный вывод.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=DUMP_BATCH_SIZE,
+            help='Сколько записей читать из базы за раз.'
+        )
+
+    def handle(self, *args, **options):
+        path = options['output']
+        output = (self.stdout if path == '-'
+                  else OutputWrapper(open(path, 'w', encoding='utf-8')))
+        started = time.monotonic()
+        total = 0
+        try:
+            for row in export_rows(options['batch_size']):
+                output.write(dumps(row))
+                total += 1
+        finally:
+            if output is not self.stdout:
+                output.close()
+        elapsed = time.monotonic() - started
+        # Отчет пишется в stderr, так как stdout может быть занят выгрузкой
+        self.stderr.write(self.style.SUCCESS(
+            f'Выгружено записей: {total} за {elapsed:.1f} с '
+            f'({total / max(elapsed, 1e-6):.0f} записей/с)'))
@@ -0,0 +1,101 @@
+import json
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts.constants import DUMP_BATCH_SIZE
+from posts.dump import DUMP_MODELS, finish_import, import_rows
+
+
+class Command(BaseCommand):
+    help = ('Загружает данные, выгруженные командой export_yatube. '
+            'Файл читается построчно, объекты сохраняются пачками.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'input', help='Файл NDJSON; "-" - стандартный ввод.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=DUMP_BATCH_SIZE,
+            help='Сколько объектов сохранять за раз.'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help=('Файл с номером последней загруженной строки. Если он '
+                  'есть, загрузка продолжается со следующей строки.')
+        )
+
+    def read_checkpoint(self, path):
+        if path is None or not os.path.exists(path):
+            return 0
+        with open(path) as checkpoint:
+            return int(checkpoint.read().strip() or 0)
+
+    def write_checkpoint(self, path, line):
+        if path is None:
+            return
+        with open(path, 'w') as checkpoint:
+            checkpoint.write(str(line))
+
+    def read_rows(self, stream, skip):
+        '''Перебирает объекты файла после строки skip с их номерами строк.'''
+        for number, line in enumerate(stream, 1):
+            if number <= skip or not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as error:
+                raise CommandError(f'Строка {number}: {error}')
+            if row.get('model') not in DUMP_MODELS:
+                raise CommandError(
+                    f'Строка {number}: неизвестная модель '
+                    f'{row.get("model")!r}')
+            yield number, row
+
+    def handle(self, *args, **options):
+        path = options['input']
+        batch_size = options['batch_size']
+        checkpoint = options['checkpoint']
+        skip = self.read_checkpoint(checkpoint)
+        started = time.monotonic()
+        total = 0
+        label, batch, last_line = None, [], skip
+
+        def flush():
+            nonlocal total
+            if batch:
+                with transaction.atomic():
+                    import_rows(label, batch)
+                total += len(batch)
+                batch.clear()
+            self.write_checkpoint(checkpoint, last_line)
+            if options['verbosity'] > 1:
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f'{label}: загружено {total} '
+                    f'({total / max(elapsed, 1e-6):.0f} записей/с)')
+
+        stream = (sys.stdin if path == '-'
+                  else open(path, encoding='utf-8'))
+        try:
+            for number, row in self.read_rows(stream, skip):
+                if batch and (row['model'] != label
+                              or len(batch) >= batch_size):
+                    flush()
+                label = row['model']
+                batch.append(row)
+                last_line = number
+            flush()
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        finish_import()
+        if checkpoint is not None and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено записей: {total} за {elapsed:.1f} с '
+            f'({total / max(elapsed, 1e-6):.0f} записей/с)'))
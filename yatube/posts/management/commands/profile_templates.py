@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+
+from core.template_profiler import TemplateProfiler
+from posts.benchmark import get_targets
+
+
+class Command(BaseCommand):
+    help = ('Показывает для основных страниц posts время отрисовки '
+            'каждого шаблона и include (в миллисекундах на запрос).')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat', type=int, default=10,
+            help='Сколько раз запросить каждую страницу.'
+        )
+        parser.add_argument(
+            '--with-cache', action='store_true',
+            help=('Не отключать кеш: по умолчанию страницы и карточки '
+                  'постов отрисовываются полностью.')
+        )
+
+    def handle(self, *args, **options):
+        overrides = {'QUERY_LOG_SAMPLE_RATE': 0}
+        if not options['with_cache']:
+            overrides['CACHES'] = {'default': {
+                'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+            }}
+        with override_settings(**overrides):
+            self.profile(options['repeat'])
+
+    def profile(self, repeat):
+        user, targets = get_targets(samples=1)
+        client = Client()
+        if user is not None:
+            client.force_login(user)
+        for name, paths in targets.items():
+            with TemplateProfiler() as profiler:
+                for _ in range(repeat):
+                    client.get(paths[0])
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{name} {paths[0]}'))
+            self.stdout.write(
+                f'  {"шаблон":<40}{"вызовов":>9}{"всего":>9}'
+                f'{"свое":>9}{"SQL":>9}')
+            for template, stats in profiler.report():
+                self.stdout.write(
+                    f'  {template:<40}{stats["calls"] / repeat:>9.1f}'
+                    f'{stats["total"] * 1000 / repeat:>9.2f}'
+                    f'{stats["self"] * 1000 / repeat:>9.2f}'
+                    f'{stats["sql"] * 1000 / repeat:>9.2f}')
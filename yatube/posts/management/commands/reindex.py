@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from posts import search
+from posts.constants import SEARCH_BATCH_SIZE
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает поисковый индекс постов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=SEARCH_BATCH_SIZE,
+            help='Сколько постов индексировать за раз.'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        backend = search.get_backend()
+        backend.clear()
+        posts = Post.objects.order_by('pk').values_list('pk', 'text')
+        batch = []
+        total = 0
+        for post in posts.iterator(chunk_size=batch_size):
+            batch.append(post)
+            if len(batch) == batch_size:
+                backend.index(batch)
+                total += len(batch)
+                batch = []
+        backend.index(batch)
+        total += len(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано постов: {total}'))
@@ -0,0 +1,69 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.core.management.base import BaseCommand
+
+from posts.constants import (THUMBNAIL_BATCH_SIZE, THUMBNAIL_POLL_INTERVAL,
+                             THUMBNAIL_WORKERS)
+from posts.thumbnails import claim_jobs, init_worker, process_job
+
+
+class Command(BaseCommand):
+    help = 'Выполняет задания на подготовку миниатюр картинок постов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=THUMBNAIL_WORKERS,
+            help='Количество процессов; 0 - выполнять в текущем процессе.'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить задания из очереди и завершиться.'
+        )
+
+    def run_batch(self, executor, job_ids):
+        '''
+        Выполняет задания пачки. Ошибка одного задания не останавливает
+        обработчик: оно остается в RUNNING и после THUMBNAIL_LEASE
+        забирается снова.
+        '''
+        if executor is None:
+            calls = [partial(process_job, job_id) for job_id in job_ids]
+        else:
+            calls = [
+                executor.submit(process_job, job_id).result
+                for job_id in job_ids
+            ]
+        results = []
+        for job_id, call in zip(job_ids, calls):
+            try:
+                results.append(call())
+            except Exception as error:
+                self.stderr.write(f'Задание {job_id}: {error!r}')
+                results.append(False)
+        return results
+
+    def handle(self, *args, **options):
+        executor = None
+        if options['workers'] > 0:
+            executor = ProcessPoolExecutor(
+                max_workers=options['workers'], initializer=init_worker
+            )
+        done = failed = 0
+        try:
+            while True:
+                job_ids = claim_jobs(THUMBNAIL_BATCH_SIZE)
+                if not job_ids:
+                    if options['once']:
+                        break
+                    time.sleep(THUMBNAIL_POLL_INTERVAL)
+                    continue
+                results = self.run_batch(executor, job_ids)
+                done += results.count(True)
+                failed += results.count(False)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        self.stdout.write(self.style.SUCCESS(
+            f'Выполнено заданий: {done}, с ошибкой: {failed}'))
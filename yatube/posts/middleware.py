@@ -0,0 +1,68 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.urls import Resolver404, resolve
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from .constants import (ANON_PAGE_CACHE_PARAMS, ANON_PAGE_CACHE_TIMEOUT,
+                        ANON_PAGE_CACHE_VIEWS)
+from .page_cache import get_comments_version, get_generation
+
+
+class AnonymousPageCacheMiddleware:
+    '''
+    Отдает анонимным пользователям готовые страницы из кеша, не доходя
+    до сессий, CSRF, view и шаблонов. Должен стоять перед
+    SessionMiddleware.
+
+    Анонимным считается запрос без cookie сессии. Кешируются GET-ответы
+    страниц ANON_PAGE_CACHE_VIEWS, у которых в адресе нет других
+    параметров, кроме ANON_PAGE_CACHE_PARAMS. Ключ содержит поколение
+    кеша страниц (меняется с постами и группами), а у страницы поста -
+    еще и версию ее комментариев. Остальные изменения (например,
+    счетчики подписчиков в профиле) видны через ANON_PAGE_CACHE_TIMEOUT
+    секунд.
+    '''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def get_cache_key(self, request):
+        if (request.method not in ('GET', 'HEAD')
+                or settings.SESSION_COOKIE_NAME in request.COOKIES
+                or not set(request.GET) <= set(ANON_PAGE_CACHE_PARAMS)):
+            return None
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None
+        if match.view_name not in ANON_PAGE_CACHE_VIEWS:
+            return None
+        request.resolver_match = match
+        version = get_generation()
+        if 'post_id' in match.kwargs:
+            version = (f'{version}.'
+                       f'{get_comments_version(match.kwargs["post_id"])}')
+        path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+        return f'anon_page:{version}:{path}'
+
+    def __call__(self, request):
+        key = self.get_cache_key(request)
+        if key is None:
+            return self.get_response(request)
+        response = cache.get(key)
+        if response is not None:
+            return get_conditional_response(
+                request, etag=response.get('ETag'),
+                last_modified=parse_http_date_safe(
+                    response.get('Last-Modified', '')),
+                response=response,
+            )
+        response = self.get_response(request)
+        if (request.method == 'GET' and response.status_code == 200
+                and not response.streaming and not response.cookies
+                and not request.user.is_authenticated):
+            cache.set(key, response, ANON_PAGE_CACHE_TIMEOUT)
+        return response
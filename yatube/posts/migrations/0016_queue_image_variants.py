@@ -0,0 +1,26 @@
+from django.db import migrations
+
+
+def queue_existing_images(apps, schema_editor):
+    # Адаптивные варианты уже загруженных картинок создает обработчик
+    # thumbnail_worker; до этого выводится исходная картинка.
+    Post = apps.get_model('posts', 'Post')
+    ThumbnailJob = apps.get_model('posts', 'ThumbnailJob')
+    posts = Post.objects.exclude(image='').filter(image_ready=True)
+    ThumbnailJob.objects.bulk_create(
+        (ThumbnailJob(post_id=post_id)
+         for post_id in posts.values_list('pk', flat=True)),
+        batch_size=500
+    )
+    posts.update(image_ready=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_auto_20261018_0458'),
+    ]
+
+    operations = [
+        migrations.RunPython(queue_existing_images, migrations.RunPython.noop),
+    ]
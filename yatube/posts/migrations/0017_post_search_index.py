@@ -0,0 +1,98 @@
+import re
+
+from django.db import migrations
+
+# Копия posts/search/stemmer.py на момент миграции: миграция не должна
+# зависеть от кода приложения, который может измениться. Если стеммер
+# изменится, индекс перестраивает команда reindex.
+WORD = re.compile(r'\w+')
+RV = re.compile(r'^(.*?[аеиоуыэюя])(.*)$')
+PERFECTIVE_GERUND = re.compile(
+    r'((ив|ивши|ившись|ыв|ывши|ывшись)|((?<=[ая])(в|вши|вшись)))$'
+)
+REFLEXIVE = re.compile(r'(с[яь])$')
+ADJECTIVE = re.compile(
+    r'(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|их|ых|'
+    r'ую|юю|ая|яя|ою|ею)$'
+)
+PARTICIPLE = re.compile(r'((ивш|ывш|ующ)|((?<=[ая])(ем|нн|вш|ющ|щ)))$')
+VERB = re.compile(
+    r'((ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло|'
+    r'ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю)|'
+    r'((?<=[ая])(ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)))$'
+)
+NOUN = re.compile(
+    r'(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|ем|'
+    r'ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$'
+)
+DERIVATIONAL = re.compile(r'.*[^аеиоуыэюя]+[аеиоуыэюя].*ость?$')
+DERIVATIONAL_ENDING = re.compile(r'ость?$')
+SUPERLATIVE = re.compile(r'(ейше|ейш)$')
+
+
+def stem(word):
+    '''Возвращает основу слова.'''
+    word = word.lower().replace('ё', 'е')
+    match = RV.match(word)
+    if match is None:
+        return word
+    start, rv = match.groups()
+    result = PERFECTIVE_GERUND.sub('', rv, 1)
+    if result == rv:
+        rv = REFLEXIVE.sub('', rv, 1)
+        result = ADJECTIVE.sub('', rv, 1)
+        if result != rv:
+            rv = PARTICIPLE.sub('', result, 1)
+        else:
+            result = VERB.sub('', rv, 1)
+            rv = NOUN.sub('', rv, 1) if result == rv else result
+    else:
+        rv = result
+    rv = re.sub('и$', '', rv)
+    if DERIVATIONAL.match(rv):
+        rv = DERIVATIONAL_ENDING.sub('', rv)
+    result = re.sub('ь$', '', rv)
+    if result == rv:
+        rv = re.sub('нн$', 'н', SUPERLATIVE.sub('', rv))
+    else:
+        rv = result
+    return start + rv
+
+
+def stems(text):
+    '''Разбивает текст на слова и возвращает список их основ.'''
+    return [stem(word) for word in WORD.findall(text)]
+
+
+def create_index(apps, schema_editor):
+    # Индекс FTS5 есть только в SQLite, для других СУБД используется
+    # бэкенд поиска без отдельной таблицы
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Post = apps.get_model('posts', 'Post')
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE posts_post_fts USING fts5('
+        "body, tokenize = 'unicode61 remove_diacritics 2')"
+    )
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            'INSERT INTO posts_post_fts (rowid, body) VALUES (%s, %s)',
+            ((pk, ' '.join(stems(text))) for pk, text in
+             Post.objects.values_list('pk', 'text').iterator())
+        )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS posts_post_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_queue_image_variants'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:46
+
+from django.db import migrations, models
+
+
+def queue_ready_images(apps, schema_editor):
+    # Варианты уже обработанных картинок нигде не записаны: обработчик
+    # thumbnail_worker создает их заново и записывает в image_variants.
+    Post = apps.get_model('posts', 'Post')
+    ThumbnailJob = apps.get_model('posts', 'ThumbnailJob')
+    posts = Post.objects.exclude(image='').filter(image_ready=True)
+    ThumbnailJob.objects.bulk_create(
+        (ThumbnailJob(post_id=post_id)
+         for post_id in posts.values_list('pk', flat=True)),
+        batch_size=500
+    )
+    posts.update(image_ready=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_comment_threads'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_variants',
+            field=models.TextField(blank=True, editable=False, verbose_name='Созданные варианты картинки'),
+        ),
+        migrations.RunPython(queue_ready_images, migrations.RunPython.noop),
+    ]
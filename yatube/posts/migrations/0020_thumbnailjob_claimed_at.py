@@ -0,0 +1,28 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:53
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def lease_running_jobs(apps, schema_editor):
+    # Задания, взятые в работу до появления поля, считаются взятыми
+    # при создании и по истечении срока забираются снова.
+    ThumbnailJob = apps.get_model('posts', 'ThumbnailJob')
+    ThumbnailJob.objects.filter(status='running').update(
+        claimed_at=F('created'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_post_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='thumbnailjob',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Взято в работу'),
+        ),
+        migrations.RunPython(lease_running_jobs, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,5 @@
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import models, transaction
 
 User = get_user_model()
 
@@ -22,6 +22,10 @@ class Post(models.Model):
         'Дата публикации',
         auto_now_add=True
     )
+    updated_at = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True
+    )
     author = models.ForeignKey(
         User,
         related_name='posts',
@@ -42,9 +46,36 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    image_ready = models.BooleanField(
+        'Миниатюры картинки готовы',
+        default=False,
+        editable=False
+    )
+    image_variants = models.TextField(
+        'Созданные варианты картинки',
+        blank=True,
+        editable=False
+    )
+    comments_count = models.PositiveIntegerField(
+        'Количество комментариев',
+        default=0,
+        editable=False
+    )
+    fanned_out = models.BooleanField(
+        'Разослан в ленты подписчиков',
+        default=False,
+        editable=False
+    )
 
     class Meta:
         ordering = ('-pub_date',)
+        indexes = (
+            models.Index(fields=('-pub_date',), name='post_pub_date_idx'),
+            models.Index(fields=('author', '-pub_date'),
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=('group', '-pub_date'),
+                         name='post_group_pub_date_idx'),
+        )
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
@@ -73,15 +104,83 @@ class Comment(models.Model):
         on_delete=models.CASCADE,
         verbose_name='Автор'
     )
+    parent = models.ForeignKey(
+        'self',
+        related_name='replies',
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        verbose_name='Ответ на комментарий'
+    )
+    # Материализованный путь: id предков и самого комментария,
+    # дополненные нулями до PATH_DIGITS знаков, через точку.
+    path = models.CharField(
+        'Путь в ветке',
+        max_length=255,
+        default='',
+        editable=False
+    )
+
+    PATH_DIGITS = 10
+    PATH_SEPARATOR = '.'
 
     class Meta:
         ordering = ('-created',)
+        indexes = (
+            models.Index(fields=('post', '-created'),
+                         name='comment_post_created_idx'),
+            models.Index(fields=('post', 'path'),
+                         name='comment_post_path_idx'),
+        )
         verbose_name = ("Комментарий")
         verbose_name_plural = ("Комментарии")
 
     def __str__(self):
         return self.text[:15]
 
+    @property
+    def depth(self):
+        '''Уровень вложенности: 0 у комментариев к самому посту.'''
+        return self.path.count(self.PATH_SEPARATOR)
+
+    def build_path(self):
+        segment = str(self.pk).zfill(self.PATH_DIGITS)
+        if self.parent_id is None:
+            return segment
+        return f'{self.parent.path}{self.PATH_SEPARATOR}{segment}'
+
+    def save(self, *args, **kwargs):
+        '''
+        Путь строится из id, поэтому записывается после вставки, в той же
+        транзакции: комментарий без пути выпал бы из веток.
+        '''
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+            if not self.path:
+                self.path = self.build_path()
+                Comment.objects.filter(pk=self.pk).update(path=self.path)
+
+
+class FollowQuerySet(models.QuerySet):
+    def delete(self):
+        '''
+        Удаляет подписки одним DELETE и обновляет счетчики и ленты
+        запросами по всем затронутым пользователям сразу.
+        '''
+        # follows импортирует модели, поэтому импорт здесь
+        from .follows import delete_follows
+        return delete_follows(self)
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def delete_rows(self):
+        '''Только DELETE, без обновления счетчиков и лент.'''
+        return super().delete()
+
+    delete_rows.alters_data = True
+    delete_rows.queryset_only = True
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -97,6 +196,114 @@ class Follow(models.Model):
         verbose_name='Блогер'
     )
 
+    objects = FollowQuerySet.as_manager()
+
     class Meta:
+        constraints = (
+            models.UniqueConstraint(fields=('user', 'author'),
+                                    name='unique_follow'),
+        )
         verbose_name = ("Подписка")
         verbose_name_plural = ("Подписки")
+
+    def delete(self, using=None, keep_parents=False):
+        return Follow.objects.using(using).filter(pk=self.pk).delete()
+
+
+class ThumbnailJob(models.Model):
+    '''Задание на подготовку миниатюр картинки поста.'''
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Готово'),
+        (FAILED, 'Ошибка'),
+    )
+
+    post = models.ForeignKey(
+        Post,
+        related_name='thumbnail_jobs',
+        on_delete=models.CASCADE,
+        verbose_name='Пост'
+    )
+    status = models.CharField(
+        'Состояние',
+        max_length=16,
+        choices=STATUSES,
+        default=PENDING
+    )
+    error = models.TextField('Ошибка', blank=True)
+    created = models.DateTimeField(
+        'Дата создания',
+        auto_now_add=True
+    )
+    claimed_at = models.DateTimeField(
+        'Взято в работу',
+        null=True,
+        blank=True
+    )
+
+    class Meta:
+        ordering = ('created',)
+        indexes = (
+            models.Index(fields=('status', 'created'),
+                         name='thumbnailjob_status_idx'),
+        )
+        verbose_name = ("Задание на миниатюры")
+        verbose_name_plural = ("Задания на миниатюры")
+
+    def __str__(self):
+        return f'{self.post_id}: {self.status}'
+
+
+class FeedEntry(models.Model):
+    '''Запись материализованной ленты подписок пользователя.'''
+    user = models.ForeignKey(
+        User,
+        related_name='feed_entries',
+        on_delete=models.CASCADE,
+        verbose_name='Читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        related_name='feed_entries',
+        on_delete=models.CASCADE,
+        verbose_name='Пост'
+    )
+
+    class Meta:
+        unique_together = ('user', 'post')
+        verbose_name = ("Запись ленты")
+        verbose_name_plural = ("Записи лент")
+
+
+class Profile(models.Model):
+    '''Счетчики автора, поддерживаемые при записи постов и подписок.'''
+    user = models.OneToOneField(
+        User,
+        related_name='profile',
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField(
+        'Количество постов',
+        default=0
+    )
+    followers_count = models.PositiveIntegerField(
+        'Количество подписчиков',
+        default=0
+    )
+    following_count = models.PositiveIntegerField(
+        'Количество подписок',
+        default=0
+    )
+
+    class Meta:
+        verbose_name = ("Профиль")
+        verbose_name_plural = ("Профили")
+
+    def __str__(self):
+        return str(self.user)
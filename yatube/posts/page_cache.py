@@ -0,0 +1,149 @@
+'''
+Кеширование страниц с инвалидацией по событиям.
+
+Ключ страницы содержит номер поколения, который увеличивается при
+каждом изменении постов и групп (см. signals.py). Поэтому страницы
+хранятся в кеше без срока действия и устаревают сразу после записи.
+После инвалидации страницу пересчитывает только один запрос: он
+захватывает блокировку через cache.add, а остальные в это время
+получают предыдущую версию страницы или ждут новую.
+'''
+import hashlib
+import time
+from functools import wraps
+
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.utils import timezone
+
+from .constants import PAGE_CACHE_LOCK_TIMEOUT, PAGE_CACHE_WAIT
+from .follows import get_following_version
+
+GENERATION_KEY = 'posts:generation'
+# Время последней смены поколения (для заголовка Last-Modified).
+# Ключ начинается с GENERATION_KEY, чтобы тоже читаться из общего кеша.
+CHANGED_KEY = 'posts:generation:changed'
+# Время последнего изменения комментариев к любому посту: поколение
+# при этом не меняется, а счетчики комментариев выводятся в списках API.
+COMMENTS_CHANGED_KEY = 'posts:generation:comments:changed'
+
+
+def get_generation():
+    '''Возвращает текущее поколение кеша страниц.'''
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        # Начальное значение берется по времени, чтобы после вытеснения
+        # ключа из кеша не вернуться к одному из прошлых поколений.
+        cache.add(GENERATION_KEY, int(time.time() * 1000), None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def bump_generation():
+    '''Делает недействительными все страницы, закешированные ранее.'''
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        get_generation()
+    cache.set(CHANGED_KEY, timezone.now(), None)
+
+
+def _comments_key(post_id):
+    # Ключ начинается с GENERATION_KEY, чтобы читаться из общего кеша
+    return f'{GENERATION_KEY}:comments:{post_id}'
+
+
+def get_comments_version(post_id):
+    '''Версия комментариев поста: меняется с каждым комментарием.'''
+    return cache.get(_comments_key(post_id), 0)
+
+
+def bump_comments(post_id):
+    '''Делает недействительными закешированные страницы поста.'''
+    key = _comments_key(post_id)
+    if not cache.add(key, int(time.time() * 1000), None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, int(time.time() * 1000), None)
+    cache.set(COMMENTS_CHANGED_KEY, timezone.now(), None)
+
+
+def get_changed_at():
+    '''Время последнего изменения постов и групп или None.'''
+    return cache.get(CHANGED_KEY)
+
+
+def get_comments_changed_at():
+    '''Время последнего изменения комментариев или None.'''
+    return cache.get(COMMENTS_CHANGED_KEY)
+
+
+def card_fragment_key(post):
+    '''
+    Ключ фрагмента карточки поста: тот же, что у тега cache
+    в posts/includes/post_card.html.
+    '''
+    return make_template_fragment_key(
+        'post_card',
+        [post.id, post.updated_at, post.author.get_full_name()]
+    )
+
+
+def prefetch_cards(posts):
+    '''
+    Читает фрагменты карточек всех постов страницы одним запросом
+    к общему кешу. NearCache оставляет их в локальном уровне, и теги
+    cache в карточках больше не обращаются к общему кешу по одному.
+    '''
+    cache.get_many([card_fragment_key(post) for post in posts])
+
+
+def _wait_for(key):
+    deadline = time.monotonic() + PAGE_CACHE_LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(PAGE_CACHE_WAIT)
+        response = cache.get(key)
+        if response is not None:
+            return response
+    return None
+
+
+def versioned_cache_page(key_prefix):
+    '''
+    Декоратор view: кеширует ответ на GET-запрос для каждого
+    пользователя и адреса страницы до смены поколения.
+    '''
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+            base = f'{key_prefix}:{request.user.pk or 0}:{path}'
+            if request.user.is_authenticated:
+                # Ссылки на подписку в карточках зависят от подписок
+                base += f':{get_following_version(request.user.pk)}'
+            key = f'{base}:{get_generation()}'
+            stale_key = f'{base}:stale'
+            response = cache.get(key)
+            if response is not None:
+                return response
+            lock_key = f'{key}:lock'
+            owns_lock = cache.add(lock_key, 1, PAGE_CACHE_LOCK_TIMEOUT)
+            if not owns_lock:
+                response = cache.get(stale_key) or _wait_for(key)
+                if response is not None:
+                    return response
+            try:
+                response = view(request, *args, **kwargs)
+                if response.status_code == 200:
+                    cache.set_many({key: response, stale_key: response},
+                                   None)
+            finally:
+                # Чужую блокировку не снимаем: ее владелец еще считает
+                if owns_lock:
+                    cache.delete(lock_key)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,43 @@
+'''
+Полнотекстовый поиск по постам.
+
+Индекс обновляется при сохранении и удалении постов (см. signals.py),
+полностью перестраивается командой reindex.
+'''
+from django.conf import settings
+from django.db import connection
+from django.utils.module_loading import import_string
+
+from posts.constants import SEARCH_MAX_RESULTS
+
+DEFAULT_BACKENDS = {
+    'sqlite': 'posts.search.backends.SQLiteFTSBackend',
+}
+FALLBACK_BACKEND = 'posts.search.backends.SimpleSearchBackend'
+
+_backend = None
+
+
+def get_backend():
+    '''Возвращает бэкенд из POSTS_SEARCH_BACKEND или подходящий для СУБД.'''
+    global _backend
+    if _backend is None:
+        path = getattr(settings, 'POSTS_SEARCH_BACKEND', None) or (
+            DEFAULT_BACKENDS.get(connection.vendor, FALLBACK_BACKEND)
+        )
+        _backend = import_string(path)()
+    return _backend
+
+
+def index_posts(posts):
+    '''Индексирует посты, заданные парами (id, текст).'''
+    get_backend().index(posts)
+
+
+def remove_posts(post_ids):
+    get_backend().remove(post_ids)
+
+
+def search(query, limit=SEARCH_MAX_RESULTS):
+    '''Возвращает id найденных постов, самые релевантные первыми.'''
+    return get_backend().search(query, limit)
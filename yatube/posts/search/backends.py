@@ -0,0 +1,106 @@
+'''
+Бэкенды поиска по постам.
+
+Бэкенд хранит индекс основ слов (см. stemmer.py) и по запросу возвращает
+id подходящих постов в порядке релевантности. Используемый бэкенд
+задается настройкой POSTS_SEARCH_BACKEND.
+'''
+from django.db import connection
+
+from posts.models import Post
+
+from .stemmer import stems
+
+
+class BaseSearchBackend:
+    '''Интерфейс бэкенда поиска.'''
+
+    def index(self, posts):
+        '''Добавляет или обновляет в индексе пары (id поста, текст).'''
+        raise NotImplementedError
+
+    def remove(self, post_ids):
+        '''Удаляет посты из индекса.'''
+        raise NotImplementedError
+
+    def clear(self):
+        '''Очищает индекс.'''
+        raise NotImplementedError
+
+    def search(self, query, limit):
+        '''Возвращает до limit id постов, подходящих под запрос.'''
+        raise NotImplementedError
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    '''
+    Инвертированный индекс на виртуальной таблице SQLite FTS5
+    (создается миграцией). В таблице хранятся основы слов поста,
+    rowid записи совпадает с id поста. Результаты упорядочены
+    по релевантности (bm25), при равной - от новых к старым.
+    '''
+    table = 'posts_post_fts'
+
+    def index(self, posts):
+        rows = [(pk, ' '.join(stems(text))) for pk, text in posts]
+        if not rows:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {self.table} WHERE rowid = %s',
+                [(pk,) for pk, _ in rows]
+            )
+            cursor.executemany(
+                f'INSERT INTO {self.table} (rowid, body) VALUES (%s, %s)',
+                rows
+            )
+
+    def remove(self, post_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {self.table} WHERE rowid = %s',
+                [(pk,) for pk in post_ids]
+            )
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+
+    def search(self, query, limit):
+        # Каждая основа ищется как префикс, все основы обязательны
+        terms = ' '.join(f'"{term}"*' for term in stems(query))
+        if not terms:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s '
+                f'ORDER BY bm25({self.table}), rowid DESC LIMIT %s',
+                (terms, limit)
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class SimpleSearchBackend(BaseSearchBackend):
+    '''
+    Поиск без отдельного индекса для СУБД без полнотекстового поиска:
+    пост должен содержать все основы слов запроса. Просматривает таблицу
+    постов целиком, поэтому годится только для небольших баз.
+    '''
+
+    def index(self, posts):
+        pass
+
+    def remove(self, post_ids):
+        pass
+
+    def clear(self):
+        pass
+
+    def search(self, query, limit):
+        terms = stems(query)
+        if not terms:
+            return []
+        posts = Post.objects.order_by('-pub_date')
+        for term in terms:
+            posts = posts.filter(text__icontains=term)
+        return list(posts.values_list('pk', flat=True)[:limit])
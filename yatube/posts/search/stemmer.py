@@ -0,0 +1,65 @@
+'''
+Стеммер для русского языка (алгоритм Snowball/Портера).
+
+Слова без русских гласных (латиница, числа) возвращаются как есть,
+только в нижнем регистре.
+'''
+import re
+
+WORD = re.compile(r'\w+')
+RV = re.compile(r'^(.*?[аеиоуыэюя])(.*)$')
+PERFECTIVE_GERUND = re.compile(
+    r'((ив|ивши|ившись|ыв|ывши|ывшись)|((?<=[ая])(в|вши|вшись)))$'
+)
+REFLEXIVE = re.compile(r'(с[яь])$')
+ADJECTIVE = re.compile(
+    r'(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|их|ых|'
+    r'ую|юю|ая|яя|ою|ею)$'
+)
+PARTICIPLE = re.compile(r'((ивш|ывш|ующ)|((?<=[ая])(ем|нн|вш|ющ|щ)))$')
+VERB = re.compile(
+    r'((ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло|'
+    r'ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю)|'
+    r'((?<=[ая])(ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)))$'
+)
+NOUN = re.compile(
+    r'(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|ем|'
+    r'ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$'
+)
+DERIVATIONAL = re.compile(r'.*[^аеиоуыэюя]+[аеиоуыэюя].*ость?$')
+DERIVATIONAL_ENDING = re.compile(r'ость?$')
+SUPERLATIVE = re.compile(r'(ейше|ейш)$')
+
+
+def stem(word):
+    '''Возвращает основу слова.'''
+    word = word.lower().replace('ё', 'е')
+    match = RV.match(word)
+    if match is None:
+        return word
+    start, rv = match.groups()
+    result = PERFECTIVE_GERUND.sub('', rv, 1)
+    if result == rv:
+        rv = REFLEXIVE.sub('', rv, 1)
+        result = ADJECTIVE.sub('', rv, 1)
+        if result != rv:
+            rv = PARTICIPLE.sub('', result, 1)
+        else:
+            result = VERB.sub('', rv, 1)
+            rv = NOUN.sub('', rv, 1) if result == rv else result
+    else:
+        rv = result
+    rv = re.sub('и$', '', rv)
+    if DERIVATIONAL.match(rv):
+        rv = DERIVATIONAL_ENDING.sub('', rv)
+    result = re.sub('ь$', '', rv)
+    if result == rv:
+        rv = re.sub('нн$', 'н', SUPERLATIVE.sub('', rv))
+    else:
+        rv = result
+    return start + rv
+
+
+def stems(text):
+    '''Разбивает текст на слова и возвращает список их основ.'''
+    return [stem(word) for word in WORD.findall(text)]
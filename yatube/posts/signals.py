@@ -0,0 +1,112 @@
+from django.db.models import Q
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from posts import counters, feed, follows, search, thumbnails
+from posts.models import Comment, Follow, Group, Post, User
+from posts.page_cache import bump_comments, bump_generation
+
+
+@receiver([post_save, post_delete], sender=Post)
+@receiver([post_save, post_delete], sender=Group)
+def invalidate_pages(sender, **kwargs):
+    '''Любое изменение постов и групп делает кеш страниц устаревшим.'''
+    bump_generation()
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, raw=False, **kwargs):
+    '''Новый пост учитывается в счетчике и попадает в ленты подписчиков.'''
+    if created and not raw:
+        counters.change_profile(instance.author_id, 'posts_count', 1)
+        feed.fan_out_post(instance)
+
+
+@receiver(pre_save, sender=Post)
+def image_changed(sender, instance, raw=False, update_fields=None, **kwargs):
+    '''
+    Новая картинка требует новых миниатюр: до их подготовки шаблоны
+    выводят исходную картинку (см. thumbnails.py).
+    '''
+    instance._image_changed = False
+    if raw or (update_fields is not None and 'image' not in update_fields):
+        return
+    if instance.pk is None:
+        old_image = ''
+    else:
+        old_image = Post.objects.filter(pk=instance.pk).values_list(
+            'image', flat=True).first()
+    if instance.image.name != old_image:
+        instance._image_changed = True
+        instance.image_ready = False
+        instance.image_variants = ''
+
+
+@receiver(post_save, sender=Post)
+def image_queued(sender, instance, update_fields=None, **kwargs):
+    '''Для новой картинки ставится в очередь подготовка миниатюр.'''
+    if not getattr(instance, '_image_changed', False):
+        return
+    instance._image_changed = False
+    if update_fields is not None:
+        # Поля готовности не входят в update_fields
+        Post.objects.filter(pk=instance.pk).update(
+            image_ready=False, image_variants='')
+    if instance.image:
+        thumbnails.enqueue(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.change_profile(instance.author_id, 'posts_count', -1)
+
+
+@receiver(post_save, sender=Post)
+def post_indexed(sender, instance, raw=False, update_fields=None, **kwargs):
+    '''Новый или измененный текст поста попадает в поисковый индекс.'''
+    if not raw and (update_fields is None or 'text' in update_fields):
+        search.index_posts([(instance.pk, instance.text)])
+
+
+@receiver(post_delete, sender=Post)
+def post_unindexed(sender, instance, **kwargs):
+    search.remove_posts([instance.pk])
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_comments(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.change_comments(instance.post_id, -1)
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def invalidate_post_pages(sender, instance, **kwargs):
+    '''Комментарии выводятся только на странице поста.'''
+    bump_comments(instance.post_id)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw=False, **kwargs):
+    '''При подписке лента пополняется постами автора.'''
+    if created and not raw:
+        counters.change_profile(instance.author_id, 'followers_count', 1)
+        counters.change_profile(instance.user_id, 'following_count', 1)
+        feed.backfill(instance.user_id, instance.author_id)
+        follows.forget([instance.user_id], [instance.author_id])
+
+
+@receiver(pre_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    '''
+    Подписки удаляемого пользователя удаляются заранее через
+    Follow.objects: при каскадном удалении счетчики и ленты других
+    пользователей не обновились бы.
+    '''
+    Follow.objects.filter(
+        Q(user_id=instance.pk) | Q(author_id=instance.pk)).delete()
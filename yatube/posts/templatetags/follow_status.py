@@ -0,0 +1,14 @@
+from django import template
+
+from posts.follows import request_following
+
+register = template.Library()
+
+
+@register.filter
+def is_followed(author, request):
+    '''
+    Подписан ли текущий пользователь на автора (пользователя или его id).
+    Подписки читаются один раз на запрос, см. follows.request_following.
+    '''
+    return getattr(author, 'pk', author) in request_following(request)
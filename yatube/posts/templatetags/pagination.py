@@ -0,0 +1,17 @@
+from django import template
+
+from posts.constants import PAGINATOR_WINDOW
+
+register = template.Library()
+
+
+@register.simple_tag
+def page_window(page_obj):
+    '''
+    Номера страниц для ссылок паджинатора: текущая и до PAGINATOR_WINDOW
+    страниц с каждой стороны, а не все страницы ленты.
+    '''
+    first = max(page_obj.number - PAGINATOR_WINDOW, 1)
+    last = min(page_obj.number + PAGINATOR_WINDOW,
+               page_obj.paginator.num_pages)
+    return range(first, last + 1)
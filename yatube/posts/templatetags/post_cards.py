@@ -0,0 +1,12 @@
+from django import template
+
+from posts.page_cache import prefetch_cards as prefetch
+
+register = template.Library()
+
+
+@register.simple_tag
+def prefetch_cards(posts):
+    '''Заранее читает из кеша фрагменты карточек постов страницы.'''
+    prefetch(posts)
+    return ''
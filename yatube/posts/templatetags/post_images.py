@@ -0,0 +1,10 @@
+from django import template
+
+from posts.images import image_sources
+
+register = template.Library()
+
+
+@register.simple_tag
+def picture_sources(post):
+    return image_sources(post.image, post.image_variants)
@@ -0,0 +1,237 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.db.models import QuerySet
+from django.test import TestCase
+from django.utils import timezone
+from mixer.backend.django import mixer
+
+from posts import search, thumbnails
+from posts.constants import THUMBNAIL_LEASE
+from posts.management.commands import thumbnail_worker
+from posts.models import (Comment, Follow, Group, Post, Profile,
+                          ThumbnailJob, User)
+
+
+class TestExplainViews(TestCase):
+    '''Проверка команды explain_views.'''
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = mixer.blend(User, username='RingoStarr')
+        cls.reader = mixer.blend(User, username='Reader')
+        cls.group = mixer.blend(Group, slug='test-slug')
+        cls.post = mixer.blend(Post, author=cls.user, group=cls.group,
+                               image='')
+        Follow.objects.create(user=cls.reader, author=cls.user)
+        mixer.blend(Comment, post=cls.post, author=cls.reader)
+
+    def test_views_use_indexes(self):
+        '''Запросы страниц постов не просматривают таблицы целиком.'''
+        out = StringIO()
+        call_command('explain_views', '--fail-on-scan', stdout=out)
+        output = out.getvalue()
+        for name in ('posts:index', 'posts:group_list', 'posts:profile',
+                     'posts:post_detail', 'posts:follow_index'):
+            with self.subTest(name=name):
+                self.assertIn(name, output)
+        self.assertIn('post_author_pub_date_idx', output)
+
+
+class TestRecount(TestCase):
+    '''Проверка команды recount.'''
+
+    def test_recount_repairs_drift(self):
+        '''Команда восстанавливает разошедшиеся счетчики.'''
+        author = mixer.blend(User, username='Author')
+        post = mixer.blend(Post, author=author)
+        mixer.blend(Comment, post=post, author=author)
+        Profile.objects.filter(user=author).update(posts_count=42)
+        Post.objects.filter(pk=post.pk).update(comments_count=0)
+        call_command('recount', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(Profile.objects.get(user=author).posts_count, 1)
+
+
+class TestThumbnailWorker(TestCase):
+    '''Проверка обработчика заданий на миниатюры.'''
+
+    def setUp(self):
+        self.author = mixer.blend(User, username='Author')
+        self.jobs = [
+            ThumbnailJob.objects.create(
+                post=mixer.blend(Post, author=self.author, image=''))
+            for _ in range(2)
+        ]
+
+    def test_deleted_post_is_skipped(self):
+        '''Задание удаленного поста пропускается без ошибки.'''
+        job_ids = thumbnails.claim_jobs(10)
+        self.jobs[0].post.delete()
+        self.assertIsNone(thumbnails.process_job(job_ids[0]))
+
+    def test_batch_survives_job_errors(self):
+        '''Ошибка одного задания не прерывает остальные задания пачки.'''
+        job_ids = [job.pk for job in self.jobs]
+        command = thumbnail_worker.Command(stdout=StringIO(),
+                                           stderr=StringIO())
+        with patch.object(thumbnail_worker, 'process_job',
+                          side_effect=[RuntimeError('сбой'), True]):
+            results = command.run_batch(None, job_ids)
+        self.assertEqual(results, [False, True])
+
+    def test_stale_running_jobs_are_claimed_again(self):
+        '''Брошенные в RUNNING задания по истечении срока забираются снова.'''
+        stale, fresh = self.jobs
+        now = timezone.now()
+        ThumbnailJob.objects.filter(pk=stale.pk).update(
+            status=ThumbnailJob.RUNNING,
+            claimed_at=now - timedelta(seconds=THUMBNAIL_LEASE + 1))
+        ThumbnailJob.objects.filter(pk=fresh.pk).update(
+            status=ThumbnailJob.RUNNING, claimed_at=now)
+        self.assertEqual(thumbnails.claim_jobs(10), [stale.pk])
+        self.assertEqual(thumbnails.claim_jobs(10), [])
+
+
+class TestReindex(TestCase):
+    '''Проверка команды reindex.'''
+
+    def test_reindex_restores_index(self):
+        '''Команда заново индексирует все посты пачками.'''
+        author = mixer.blend(User, username='Author')
+        posts = mixer.cycle(3).blend(Post, author=author, text='Пишу тесты')
+        search.get_backend().clear()
+        self.assertEqual(search.search('тест'), [])
+        out = StringIO()
+        call_command('reindex', '--batch-size', '2', stdout=out)
+        self.assertIn('3', out.getvalue())
+        self.assertEqual(
+            sorted(search.search('тест')), [post.pk for post in posts])
+
+
+class TestDump(TestCase):
+    '''Проверка команд export_yatube и import_yatube.'''
+
+    def setUp(self):
+        self.author = mixer.blend(User, username='Author')
+        self.reader = mixer.blend(User, username='Reader')
+        self.group = mixer.blend(Group, slug='dump')
+        self.posts = mixer.cycle(3).blend(
+            Post, author=self.author, group=self.group, image='',
+            text='Выгрузка данных')
+        mixer.blend(Comment, post=self.posts[-1], author=self.reader)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'dump.ndjson')
+        call_command('export_yatube', self.path, stderr=StringIO())
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_round_trip(self):
+        '''Выгруженные данные загружаются заново вместе с датами.'''
+        pub_dates = {post.pk: post.pub_date for post in self.posts}
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        call_command('import_yatube', self.path, '--batch-size', '2',
+                     stdout=StringIO())
+        self.assertEqual(
+            dict(Post.objects.values_list('pk', 'pub_date')), pub_dates)
+        self.assertTrue(Follow.objects.filter(
+            user__username='Reader', author__username='Author').exists())
+        self.assertEqual(Post.objects.get(pk=self.posts[-1].pk)
+                         .comments_count, 1)
+        self.assertEqual(Profile.objects.get(user=self.author).posts_count, 3)
+        self.assertEqual(len(search.search('выгрузка')), 3)
+
+    def test_import_keeps_auto_dates(self):
+        '''Загрузка не отключает auto_now у полей модели.'''
+        Post.objects.all().delete()
+        field = Post._meta.get_field('pub_date')
+        bulk_create = QuerySet.bulk_create
+        flags = []
+
+        def spy(queryset, *args, **kwargs):
+            flags.append(field.auto_now_add)
+            return bulk_create(queryset, *args, **kwargs)
+
+        with patch.object(QuerySet, 'bulk_create', spy):
+            call_command('import_yatube', self.path, stdout=StringIO())
+        self.assertTrue(flags)
+        self.assertTrue(all(flags))
+        self.assertEqual(
+            dict(Post.objects.values_list('pk', 'pub_date')),
+            {post.pk: post.pub_date for post in self.posts}
+        )
+
+    def test_existing_posts_keep_index(self):
+        '''Пропущенные при загрузке посты остаются в индексе как в базе.'''
+        post = self.posts[0]
+        post.text = 'Измененный текст'
+        post.save()
+        call_command('import_yatube', self.path, stdout=StringIO())
+        self.assertEqual(search.search('измененный'), [post.pk])
+        self.assertNotIn(post.pk, search.search('выгрузка'))
+
+    def test_resume_from_checkpoint(self):
+        '''Загрузка продолжается со строки после контрольной точки.'''
+        Post.objects.all().delete()
+        checkpoint = os.path.join(self.directory, 'checkpoint')
+        # Пропускаются пользователи, группа и первый пост
+        with open(checkpoint, 'w') as file:
+            file.write('4')
+        call_command('import_yatube', self.path,
+                     '--checkpoint', checkpoint, stdout=StringIO())
+        self.assertEqual(
+            set(Post.objects.values_list('pk', flat=True)),
+            {post.pk for post in self.posts[1:]}
+        )
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertFalse(os.path.exists(checkpoint))
+
+
+class TestBenchmark(TestCase):
+    '''Проверка команд benchmark_data и benchmark.'''
+
+    def test_benchmark_against_baseline(self):
+        '''Замеры всех страниц сохраняются и сравниваются с базовыми.'''
+        call_command('benchmark_data', '--users', '20', '--posts', '60',
+                     '--groups', '2', '--follows', '3', '--seed', '1',
+                     stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 60)
+        self.assertTrue(Follow.objects.exists())
+        with tempfile.NamedTemporaryFile(suffix='.json') as baseline:
+            call_command('benchmark', '--requests', '3', '--warmup', '1',
+                         '--save-baseline', baseline.name,
+                         stdout=StringIO())
+            out = StringIO()
+            call_command('benchmark', '--requests', '3', '--warmup', '1',
+                         '--baseline', baseline.name, stdout=out)
+        for name in ('posts:index', 'posts:group_list', 'posts:profile',
+                     'posts:post_detail', 'posts:follow_index'):
+            with self.subTest(name=name):
+                self.assertIn(name, out.getvalue())
+
+
+class TestProfileTemplates(TestCase):
+    '''Проверка команды profile_templates.'''
+
+    def test_reports_includes(self):
+        '''В отчете есть страницы и их вложенные шаблоны.'''
+        author = mixer.blend(User, username='Author')
+        mixer.cycle(3).blend(Post, author=author, image='')
+        out = StringIO()
+        call_command('profile_templates', '--repeat', '1', stdout=out)
+        output = out.getvalue()
+        for name in ('posts:index', 'posts/index.html', 'base.html',
+                     'posts/includes/post_card.html',
+                     'posts/includes/link_bar.html'):
+            with self.subTest(name=name):
+                self.assertIn(name, output)
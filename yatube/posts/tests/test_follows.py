@@ -0,0 +1,115 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from mixer.backend.django import mixer
+
+from posts import follows
+from posts.models import (FeedEntry, Follow, FollowQuerySet, Post, Profile,
+                          User)
+
+
+class TestFollowGraph(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = mixer.blend(User, username='Reader')
+        cls.authors = mixer.cycle(4).blend(User)
+        for author in cls.authors:
+            mixer.blend(Post, author=author)
+
+    def setUp(self):
+        cache.clear()
+
+    def unfollow_queries(self, author_ids):
+        follows.follow_many(self.reader.pk, author_ids)
+        with CaptureQueriesContext(connection) as queries:
+            removed = follows.unfollow_many(self.reader.pk, author_ids)
+        self.assertEqual(removed, len(author_ids))
+        return len(queries)
+
+    def test_unfollow_many(self):
+        '''Отписка от многих авторов не перебирает подписки по одной.'''
+        author_ids = [author.pk for author in self.authors]
+        self.assertEqual(follows.follow_many(self.reader.pk, author_ids), 4)
+        self.assertEqual(
+            FeedEntry.objects.filter(user=self.reader).count(), 4)
+        self.assertEqual(
+            self.unfollow_queries(author_ids[:1]),
+            self.unfollow_queries(author_ids)
+        )
+        self.assertFalse(Follow.objects.exists())
+        self.assertFalse(FeedEntry.objects.exists())
+        profiles = Profile.objects.filter(
+            user__in=[self.reader, *self.authors])
+        self.assertEqual(
+            set(profiles.values_list('followers_count', 'following_count')),
+            {(0, 0)}
+        )
+
+    def test_unfollow_after_concurrent_delete(self):
+        '''Подписка, удаленная другим запросом, не вычитается дважды.'''
+        first, second = self.authors[:2]
+        follows.follow_many(self.reader.pk, [first.pk, second.pk])
+        delete_rows = FollowQuerySet.delete_rows
+        concurrent = []
+
+        def delete_concurrently(queryset):
+            if not concurrent:
+                concurrent.append(first)
+                Follow.objects.filter(user=self.reader, author=first).delete()
+            return delete_rows(queryset)
+
+        with patch.object(FollowQuerySet, 'delete_rows',
+                          delete_concurrently):
+            removed = follows.unfollow_many(
+                self.reader.pk, [first.pk, second.pk])
+        self.assertEqual(removed, 1)
+        profiles = Profile.objects.filter(
+            user__in=[self.reader, first, second])
+        self.assertEqual(
+            set(profiles.values_list('followers_count', 'following_count')),
+            {(0, 0)}
+        )
+
+    def test_user_deletion_updates_counters(self):
+        '''Удаление пользователя обновляет счетчики его подписок.'''
+        first, second = self.authors[:2]
+        follows.follow_many(self.reader.pk, [first.pk, second.pk])
+        follows.follow_many(first.pk, [second.pk])
+        self.reader.delete()
+        self.assertEqual(
+            Profile.objects.get(user=first).followers_count, 0)
+        self.assertEqual(
+            Profile.objects.get(user=second).followers_count, 1)
+
+    def test_mutual_and_suggestions(self):
+        '''Взаимные подписки и авторы из подписок подписок.'''
+        first, second, third, fourth = self.authors
+        follows.follow_many(self.reader.pk, [first.pk, second.pk])
+        follows.follow_many(first.pk, [self.reader.pk, third.pk, fourth.pk])
+        follows.follow_many(second.pk, [third.pk])
+        self.assertEqual(follows.mutual_follows(self.reader.pk), {first.pk})
+        self.assertEqual(
+            follows.suggestions(self.reader.pk),
+            [(third.pk, 2), (fourth.pk, 1)]
+        )
+
+    @patch('posts.follows.FOLLOW_CACHE_MIN_SIZE', 1)
+    def test_cached_sets_are_reset(self):
+        '''Закешированные подписки сбрасываются при их изменении.'''
+        first, second = self.authors[:2]
+        follows.follow_many(self.reader.pk, [first.pk])
+        self.assertEqual(follows.get_following(self.reader.pk), {first.pk})
+        with CaptureQueriesContext(connection) as queries:
+            follows.get_following(self.reader.pk)
+        self.assertFalse(
+            [query for query in queries if 'posts_follow' in query['sql']])
+        Follow.objects.create(user=self.reader, author=second)
+        self.assertEqual(follows.get_following(self.reader.pk),
+                         {first.pk, second.pk})
+        follows.unfollow_many(self.reader.pk, [first.pk])
+        self.assertEqual(follows.get_followers(first.pk), set())
+        self.assertEqual(follows.get_following(self.reader.pk), {second.pk})
@@ -1,13 +1,19 @@
 import shutil
 import tempfile
+from io import StringIO
 
 from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from mixer.backend.django import mixer
 
-from posts.models import Group, Post, User
+from posts.constants import IMAGE_VARIANT_WIDTHS
+from posts.images import variant_name
+from posts.models import Group, Post, ThumbnailJob, User
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -101,3 +107,51 @@ class TestForms(TestCase):
         else:
             self.assertEqual(len(new_set), 1,
                              msg='Запись в базе данных не создалась.')
+
+    def test_image_thumbnails_prepared_in_background(self):
+        '''Миниатюры новой картинки готовит обработчик очереди.'''
+        small_gif = (
+            b'\x47\x49\x46\x38\x39\x61\x02\x00'
+            b'\x01\x00\x80\x00\x00\x00\x00\x00'
+            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+            b'\x0A\x00\x3B'
+        )
+        self.author.post(
+            reverse('posts:post_create'),
+            data={
+                'text': 'Пост с картинкой',
+                'image': SimpleUploadedFile(
+                    name='queued.gif',
+                    content=small_gif,
+                    content_type='image/gif'
+                ),
+            }
+        )
+        post = Post.objects.get(text='Пост с картинкой')
+        job = post.thumbnail_jobs.get()
+        self.assertFalse(post.image_ready)
+        self.assertEqual(job.status, ThumbnailJob.PENDING)
+        call_command('thumbnail_worker', '--once', '--workers', '0',
+                     stdout=StringIO())
+        post.refresh_from_db()
+        job.refresh_from_db()
+        self.assertTrue(post.image_ready)
+        self.assertEqual(job.status, ThumbnailJob.DONE)
+        for width in IMAGE_VARIANT_WIDTHS:
+            with self.subTest(width=width):
+                self.assertTrue(default_storage.exists(
+                    variant_name(post.image.name, width, 'jpeg')))
+        self.assertIn(f'jpeg:{IMAGE_VARIANT_WIDTHS[0]}', post.image_variants)
+        response = self.auth.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.id}))
+        self.assertContains(response, '<picture>')
+        self.assertContains(response, 'image/jpeg')
+        # В srcset выводятся только записанные обработчиком варианты
+        Post.objects.filter(pk=post.pk).update(
+            image_variants=f'jpeg:{IMAGE_VARIANT_WIDTHS[0]}')
+        cache.clear()
+        response = self.auth.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.id}))
+        self.assertNotContains(response, f'{IMAGE_VARIANT_WIDTHS[-1]}w')
@@ -1,7 +1,7 @@
 from django.test import TestCase
 from mixer.backend.django import mixer
 
-from posts.models import Group, Post, User
+from posts.models import Comment, Follow, Group, Post, User
 
 
 class TestPostModel(TestCase):
@@ -30,3 +30,45 @@ class TestGroupModel(TestCase):
         group = Group.objects.first()
         expected_object_name = group.title
         self.assertEqual(expected_object_name, str(group))
+
+
+class TestCounters(TestCase):
+    def test_counters_follow_writes(self):
+        """Счетчики меняются при создании и удалении записей."""
+        author = mixer.blend(User, username='Author')
+        reader = mixer.blend(User, username='Reader')
+        post = mixer.blend(Post, author=author)
+        follow = Follow.objects.create(user=reader, author=author)
+        mixer.cycle(2).blend(Comment, post=post, author=reader)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 2)
+        self.assertEqual(
+            (author.profile.posts_count, author.profile.followers_count),
+            (1, 1)
+        )
+        self.assertEqual(reader.profile.following_count, 1)
+        follow.delete()
+        post.comments.first().delete()
+        post.refresh_from_db()
+        author.profile.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(author.profile.followers_count, 0)
+
+
+class TestThumbnailQueue(TestCase):
+    def test_new_image_is_queued(self):
+        """Новая картинка ставится в очередь при любом сохранении поста."""
+        author = mixer.blend(User, username='Author')
+        post = Post.objects.create(author=author, text='Текст',
+                                   image='posts/first.gif')
+        self.assertEqual(post.thumbnail_jobs.count(), 1)
+        Post.objects.filter(pk=post.pk).update(image_ready=True)
+        post.refresh_from_db()
+        post.text = 'Новый текст'
+        post.save()
+        self.assertEqual(post.thumbnail_jobs.count(), 1)
+        post.image = 'posts/second.gif'
+        post.save(update_fields=('image',))
+        post.refresh_from_db()
+        self.assertFalse(post.image_ready)
+        self.assertEqual(post.thumbnail_jobs.count(), 2)
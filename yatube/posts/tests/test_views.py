@@ -1,15 +1,22 @@
 import shutil
 import tempfile
+from unittest.mock import patch
 
 from django.conf import settings
 from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.db.models import QuerySet
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from mixer.backend.django import mixer
 
-from posts.constants import NUMBER_POST_PER_PAGE
+from posts.constants import (COMMENT_MAX_DEPTH, COMMENTS_PER_PAGE,
+                             NUMBER_POST_PER_PAGE)
+from posts.feed import get_follow_feed
 from posts.forms import PostForm
-from posts.models import Group, Post, User
+from posts.models import Comment, FeedEntry, Follow, Group, Post, User
+from posts.page_cache import bump_generation, get_generation
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -54,6 +61,28 @@ class TestViews(TestCase):
         response = self.auth.get(reverse('posts:index'), {'page': 2})
         self.assertEqual(len(response.context['page_obj']), 3)
 
+    def test_cursor_pages_walk_forward_and_back(self):
+        '''Курсорный паджинатор: переходы вперед и назад без пропусков.'''
+        address = reverse('posts:group_list', kwargs={'slug': 'test-slug'})
+        first = self.auth.get(address, {'cursor': ''}).context['page_obj']
+        self.assertEqual(len(first), NUMBER_POST_PER_PAGE)
+        self.assertFalse(first.has_previous())
+        self.assertTrue(first.has_next())
+        second = self.auth.get(
+            address, {'cursor': first.next_cursor}).context['page_obj']
+        self.assertEqual(len(second), 3)
+        self.assertFalse(second.has_next())
+        self.assertEqual(
+            list(first) + list(second),
+            list(TestViews.group.posts.order_by('-pub_date', '-pk'))
+        )
+        back = self.auth.get(
+            address, {'cursor': second.previous_cursor}).context['page_obj']
+        self.assertEqual(list(back), list(first))
+        broken = self.auth.get(
+            address, {'cursor': 'not-a-cursor'}).context['page_obj']
+        self.assertEqual(list(broken), list(first))
+
     def test_page_uses_correct_templates(self):
         '''Проверка на соответствие путей и шаблонов.'''
         pages_templates = {
@@ -206,14 +235,66 @@ class TestViews(TestCase):
         post = mixer.blend(Post, author=self.user, group=self.group)
         cache.clear()
         response = self.auth.get(reverse('posts:index'))
-        post.delete()
+        Post.objects.filter(pk=post.pk).update(text='Без сигналов')
         response_cached = self.auth.get(reverse('posts:index'))
         self.assertHTMLEqual(
             response.content.decode(), response_cached.content.decode())
-        cache.clear()
-        response_cleared_cache = self.auth.get(reverse('posts:index'))
+        post.delete()
+        response_invalidated = self.auth.get(reverse('posts:index'))
         self.assertHTMLNotEqual(
-            response.content.decode(), response_cleared_cache.content.decode())
+            response.content.decode(), response_invalidated.content.decode())
+
+    def test_main_page_stale_while_recomputed(self):
+        '''Пока страницу пересчитывает другой запрос, отдается старая.'''
+        cache.clear()
+        response = self.auth.get(reverse('posts:index'))
+        mixer.blend(Post, author=self.user, group=self.group)
+        with patch.object(cache, 'add', return_value=False):
+            response_stale = self.auth.get(reverse('posts:index'))
+        self.assertHTMLEqual(
+            response.content.decode(), response_stale.content.decode())
+
+    def test_page_cache_keeps_foreign_lock(self):
+        '''Запрос, не захвативший блокировку, не снимает ее.'''
+        cache.clear()
+        get_generation()
+        with patch.object(cache, 'add', return_value=False), \
+                patch('posts.page_cache._wait_for', return_value=None), \
+                patch.object(cache, 'delete') as delete:
+            response = self.auth.get(reverse('posts:index'))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([
+            args for args, _ in delete.call_args_list
+            if str(args[0]).endswith(':lock')
+        ])
+
+    def test_post_card_cache_follows_edits(self):
+        '''Кеш карточки поста обновляется после редактирования.'''
+        post = Post.objects.filter(author=self.user).first()
+        address = reverse('posts:group_list', kwargs={'slug': 'test-slug'})
+        self.assertContains(self.anon.get(address), post.text)
+        self.assertNotContains(self.anon.get(address), 'редактировать')
+        self.assertContains(self.author.get(address), 'редактировать')
+        self.author.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.id}),
+            data={'text': 'Исправленный текст', 'group': self.group.id}
+        )
+        self.assertContains(self.anon.get(address), 'Исправленный текст')
+
+    def test_post_card_cache_follows_related_objects(self):
+        '''Карточка поста не хранит старые имя автора и ссылки.'''
+        address = reverse('posts:index')
+        self.anon.get(address)
+        User.objects.filter(pk=self.user.pk).update(
+            username='PaulMcCartney', first_name='Пол', last_name='Маккартни')
+        Group.objects.filter(pk=self.group.pk).update(slug='new-slug')
+        bump_generation()
+        response = self.anon.get(address)
+        self.assertContains(response, 'Пол Маккартни')
+        self.assertContains(response, reverse(
+            'posts:profile', kwargs={'username': 'PaulMcCartney'}))
+        self.assertContains(response, reverse(
+            'posts:group_list', kwargs={'slug': 'new-slug'}))
 
     def test_following_for_auth_user(self):
         author_name = self.user.username
@@ -244,3 +325,437 @@ class TestViews(TestCase):
         response_2 = auth_2.get(reverse('posts:follow_index'))
         self.assertNotIn(post, response_2.context['page_obj'].object_list)
         post.delete()
+
+    def test_follow_feed_materialized_and_fallback(self):
+        '''Лента подписок: рассылка при записи и чтение без рассылки.'''
+        reader = mixer.blend(User, username='Reader')
+        Follow.objects.create(user=reader, author=self.user)
+        post = mixer.blend(Post, author=self.user)
+        self.assertTrue(
+            FeedEntry.objects.filter(user=reader, post=post).exists())
+        with patch('posts.feed.FEED_FANOUT_MAX_FOLLOWERS', 0):
+            heavy_post = mixer.blend(Post, author=self.user)
+        self.assertFalse(heavy_post.fanned_out)
+        self.assertIn(heavy_post, get_follow_feed(reader))
+        self.assertEqual(
+            get_follow_feed(reader).count(),
+            self.user.posts.count()
+        )
+        Follow.objects.filter(user=reader, author=self.user).delete()
+        self.assertFalse(FeedEntry.objects.filter(user=reader).exists())
+        self.assertFalse(get_follow_feed(reader).exists())
+
+
+class TestSearch(TestCase):
+    '''Проверка поиска по постам.'''
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = mixer.blend(User, username='Searcher')
+        cls.cats = mixer.blend(Post, author=cls.user, image='',
+                               text='Котики спят, котики едят')
+        cls.cat = mixer.blend(Post, author=cls.user, image='',
+                              text='Рыжий котик и собака')
+        cls.dogs = mixer.blend(Post, author=cls.user, image='',
+                               text='Собаки гуляют')
+
+    def search(self, query):
+        response = self.client.get(reverse('posts:search'), {'q': query})
+        return list(response.context['page_obj'])
+
+    def test_search_finds_word_forms(self):
+        '''Поиск находит разные формы слова, релевантные посты выше.'''
+        self.assertEqual(self.search('котиков'), [self.cats, self.cat])
+        self.assertEqual(self.search('собака рыжая'), [self.cat])
+        self.assertEqual(self.search('кошки'), [])
+
+    def test_index_follows_changes(self):
+        '''Индекс обновляется при изменении и удалении постов.'''
+        self.dogs.text = 'Котик гуляет'
+        self.dogs.save()
+        self.assertIn(self.dogs, self.search('котики'))
+        self.assertNotIn(self.dogs, self.search('собаки'))
+        self.dogs.delete()
+        self.assertEqual(self.search('гуляет'), [])
+
+
+class TestPaginatorWindow(TestCase):
+    '''Проверка ссылок паджинатора.'''
+
+    def test_links_only_near_current_page(self):
+        '''Выводятся ссылки только на соседние страницы.'''
+        author = mixer.blend(User)
+        mixer.cycle(NUMBER_POST_PER_PAGE * 9).blend(
+            Post, author=author, image='')
+        response = self.client.get(reverse('posts:index'), {'page': 5})
+        self.assertEqual(
+            list(response.context['pages']), [2, 3, 4, 5, 6, 7, 8])
+        self.assertContains(response, '?page=8">8</a>')
+        self.assertNotContains(response, '?page=1">1</a>')
+        self.assertNotContains(response, '?page=9">9</a>')
+
+
+class TestFollowStatus(TestCase):
+    '''Проверка ссылок на подписку в карточках постов.'''
+
+    def test_follow_links_on_cards(self):
+        '''Подписки читаются один раз на всю страницу.'''
+        reader = mixer.blend(User, username='Reader')
+        followed, other = mixer.cycle(2).blend(User)
+        mixer.cycle(3).blend(Post, author=followed, image='')
+        mixer.cycle(3).blend(Post, author=other, image='')
+        Follow.objects.create(user=reader, author=followed)
+        self.client.force_login(reader)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:index'))
+        self.assertEqual(
+            len([query for query in queries
+                 if 'FROM "posts_follow"' in query['sql']]), 1)
+        self.assertContains(
+            response,
+            reverse('posts:profile_unfollow', args=(followed.username,)),
+            count=3
+        )
+        self.assertContains(
+            response,
+            reverse('posts:profile_follow', args=(other.username,)),
+            count=3
+        )
+        self.client.get(
+            reverse('posts:profile_follow', args=(other.username,)))
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(
+            response,
+            reverse('posts:profile_unfollow', args=(other.username,)),
+            count=3
+        )
+
+
+class TestComments(TestCase):
+    '''Проверка страниц и веток комментариев.'''
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = mixer.blend(User, username='RingoStarr')
+        cls.post = mixer.blend(Post, author=cls.user, image='')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def reply(self, parent):
+        self.client.post(
+            reverse('posts:add_comment', args=(self.post.id,)),
+            {'text': f'Ответ на {parent.pk}', 'parent': parent.pk}
+        )
+        return Comment.objects.get(text=f'Ответ на {parent.pk}')
+
+    def test_comments_are_paginated(self):
+        '''На странице поста первая порция, остальное по ссылке.'''
+        comments = mixer.cycle(COMMENTS_PER_PAGE + 1).blend(
+            Comment, post=self.post, author=self.user)
+        response = self.client.get(
+            reverse('posts:post_detail', args=(self.post.id,)))
+        page = response.context['comments']
+        self.assertEqual(len(page), COMMENTS_PER_PAGE)
+        self.assertNotIn(comments[0], page)
+        url = reverse('posts:comments', args=(self.post.id,))
+        response = self.client.get(url, {'cursor': page.next_cursor})
+        self.assertContains(response, comments[0].text)
+        response = self.client.get(
+            url, {'cursor': page.next_cursor, 'format': 'json'})
+        data = response.json()
+        self.assertEqual([item['id'] for item in data['results']],
+                         [comments[0].pk])
+        self.assertIsNone(data['next'])
+
+    def test_reply_thread(self):
+        '''Ответы попадают в ветку комментария.'''
+        root = mixer.blend(Comment, post=self.post, author=self.user)
+        reply = self.reply(root)
+        nested = self.reply(reply)
+        other = mixer.blend(Comment, post=self.post, author=self.user)
+        self.assertEqual(reply.parent, root)
+        self.assertEqual(nested.depth, 2)
+        response = self.client.get(
+            reverse('posts:post_detail', args=(self.post.id,)))
+        self.assertEqual(list(response.context['comments']), [other, root])
+        self.assertTrue(response.context['comments'][1].has_replies)
+        response = self.client.get(
+            reverse('posts:comment_thread', args=(self.post.id, root.pk)),
+            {'format': 'json'}
+        )
+        self.assertEqual(
+            [item['id'] for item in response.json()['results']],
+            [reply.pk, nested.pk]
+        )
+
+    @patch('posts.comments.COMMENT_THREAD_LIMIT', 1)
+    def test_long_thread_continues(self):
+        '''Длинная ветка читается порциями по ссылке на продолжение.'''
+        root = mixer.blend(Comment, post=self.post, author=self.user)
+        reply = self.reply(root)
+        nested = self.reply(reply)
+        url = reverse('posts:comment_thread', args=(self.post.id, root.pk))
+        self.assertContains(self.client.get(url), f'?after={reply.path}')
+        data = self.client.get(url, {'format': 'json'}).json()
+        self.assertEqual([item['id'] for item in data['results']],
+                         [reply.pk])
+        data = self.client.get(data['next']).json()
+        self.assertEqual([item['id'] for item in data['results']],
+                         [nested.pk])
+        self.assertIsNone(data['next'])
+
+    def test_comment_path_saved_with_comment(self):
+        '''Комментарий без пути в ветке не сохраняется.'''
+        with patch.object(QuerySet, 'update', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                Comment.objects.create(post=self.post, author=self.user,
+                                       text='Без пути')
+        self.assertFalse(Comment.objects.filter(text='Без пути').exists())
+
+    def test_depth_is_limited(self):
+        '''Ответ на самый глубокий комментарий становится соседним.'''
+        comment = mixer.blend(Comment, post=self.post, author=self.user)
+        for _ in range(COMMENT_MAX_DEPTH):
+            comment = Comment.objects.create(
+                post=self.post, author=self.user, parent=comment)
+        reply = self.reply(comment)
+        self.assertEqual(reply.depth, COMMENT_MAX_DEPTH)
+        self.assertEqual(reply.parent_id, comment.parent_id)
+
+
+class TestConditionalPages(TestCase):
+    '''Проверка ответов 304 и заголовков кеширования страниц.'''
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = mixer.blend(User, username='Conditional')
+        cls.group = mixer.blend(Group, slug='conditional')
+        cls.post = mixer.blend(Post, author=cls.author, group=cls.group,
+                               image='')
+
+    def test_anonymous_pages_are_public(self):
+        '''Анонимные ответы кешируются прокси и отвечают 304.'''
+        for url in (
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+            reverse('posts:profile', kwargs={'username': 'Conditional'}),
+            reverse('posts:group_list', kwargs={'slug': 'conditional'}),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertIn('public', response['Cache-Control'])
+                self.assertIn('Cookie', response['Vary'])
+                response = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(response.status_code, 304)
+
+    def test_validators_follow_changes(self):
+        '''Комментарий и подписка меняют ETag страниц.'''
+        reader = mixer.blend(User)
+        self.client.force_login(reader)
+        post_url = reverse('posts:post_detail',
+                           kwargs={'post_id': self.post.id})
+        profile_url = reverse('posts:profile',
+                              kwargs={'username': 'Conditional'})
+        post_etag = self.client.get(post_url)['ETag']
+        profile_response = self.client.get(profile_url)
+        self.assertIn('private', profile_response['Cache-Control'])
+        mixer.blend(Comment, post=self.post, author=reader)
+        Follow.objects.create(user=reader, author=self.author)
+        for url, etag in ((post_url, post_etag),
+                          (profile_url, profile_response['ETag'])):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+})
+class TestAnonymousPageCache(TestCase):
+    '''Проверка кеша страниц для анонимных пользователей.'''
+
+    def setUp(self):
+        cache.clear()
+        self.author = mixer.blend(User, username='Cached')
+        self.post = mixer.blend(Post, author=self.author, image='')
+        self.url = reverse('posts:post_detail',
+                           kwargs={'post_id': self.post.id})
+
+    def test_hit_skips_database(self):
+        '''Повторный запрос отдается из кеша без запросов к базе.'''
+        response = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            cached = self.client.get(self.url)
+        self.assertEqual(cached.content, response.content)
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_comment_invalidates_post_page(self):
+        '''Новый комментарий сразу виден на странице поста.'''
+        self.client.get(self.url)
+        mixer.blend(Comment, post=self.post, author=self.author,
+                    text='Свежий комментарий')
+        self.assertContains(self.client.get(self.url), 'Свежий комментарий')
+
+    def test_logged_in_users_bypass_cache(self):
+        '''Страницы с cookie сессии не кешируются.'''
+        self.client.force_login(self.author)
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url)
+        self.assertTrue(queries.captured_queries)
+
+
+class TestApi(TestCase):
+    '''Проверка JSON API лент.'''
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = mixer.blend(User, username='ApiAuthor')
+        cls.group = mixer.blend(Group, slug='api')
+        mixer.cycle(NUMBER_POST_PER_PAGE + 2).blend(
+            Post, author=cls.user, group=cls.group, image='')
+
+    def test_feeds_are_paginated_by_cursor(self):
+        '''Ленты отдаются страницами со ссылками на следующую.'''
+        for url in (reverse('posts:api_index'),
+                    reverse('posts:api_group', kwargs={'slug': 'api'}),
+                    reverse('posts:api_profile',
+                            kwargs={'username': 'ApiAuthor'})):
+            with self.subTest(url=url):
+                data = self.client.get(url).json()
+                self.assertEqual(len(data['results']), NUMBER_POST_PER_PAGE)
+                self.assertEqual(
+                    data['results'][0]['author']['username'], 'ApiAuthor')
+                rest = self.client.get(data['next']).json()
+                self.assertEqual(len(rest['results']), 2)
+                self.assertIsNone(rest['next'])
+
+    def test_unchanged_feed_answers_not_modified(self):
+        '''Неизменившаяся лента отвечает 304, новая запись меняет ETag.'''
+        url = reverse('posts:api_index')
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        mixer.blend(Post, author=self.user, image='')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_feed_etag_follows_comments(self):
+        '''Новый комментарий меняет comments_count в списке и его ETag.'''
+        url = reverse('posts:api_index')
+        etag = self.client.get(url)['ETag']
+        mixer.blend(Comment, post=self.user.posts.first(), author=self.user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_post_detail_etag_follows_comments(self):
+        '''ETag поста меняется с новым комментарием.'''
+        post = self.user.posts.first()
+        url = reverse('posts:api_post_detail', kwargs={'post_id': post.id})
+        response = self.client.get(url)
+        self.assertEqual(response.json()['comments'], [])
+        etag = response['ETag']
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        mixer.blend(Comment, post=post, author=self.user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(len(response.json()['comments']), 1)
+
+    def test_follow_feed_requires_login(self):
+        '''Лента подписок доступна только авторизованным.'''
+        url = reverse('posts:api_follow')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        reader = mixer.blend(User)
+        self.client.force_login(reader)
+        etag = self.client.get(url)['ETag']
+        Follow.objects.create(user=reader, author=self.user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(len(response.json()['results']),
+                         NUMBER_POST_PER_PAGE)
+
+
+class TestQueryBudget(TestCase):
+    '''Количество SQL-запросов страниц не зависит от числа постов.'''
+
+    # Бюджет запросов для авторизованного пользователя: запросы к
+    # данным (включая чтение сессии и пользователя) и запросы к таблице
+    # общего кеша (включая точки сохранения его транзакций). Страницы
+    # меряются при первой отрисовке после инвалидации в процессе без
+    # локальных копий: фрагменты карточек еще лежат в общем кеше
+    # и читаются одним запросом на страницу (см. prefetch_cards).
+    # Главная страница сверх того захватывает блокировку и записывает
+    # себя в кеш (см. versioned_cache_page).
+    # Профиль и пост тратят еще один запрос к данным на валидаторы для
+    # ответа 304 (см. conditional.py). Ссылки на подписку в карточках
+    # читают подписки читателя одним запросом на страницу
+    # (см. follows.request_following).
+    QUERY_BUDGET = {
+        'posts:index': (5, 21),
+        'posts:group_list': (6, 5),
+        'posts:profile': (8, 3),
+        'posts:post_detail': (6, 2),
+        'posts:follow_index': (5, 2),
+    }
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = mixer.blend(User, username='RingoStarr')
+        cls.reader = mixer.blend(User, username='Reader')
+        cls.group = mixer.blend(Group, slug='test-slug')
+        mixer.cycle(NUMBER_POST_PER_PAGE + 3).blend(
+            Post, author=cls.user, group=cls.group, image='')
+        Follow.objects.create(user=cls.reader, author=cls.user)
+        cls.post = Post.objects.first()
+        mixer.cycle(5).blend(Comment, post=cls.post, author=cls.reader)
+
+    def setUp(self):
+        self.reader = Client()
+        self.reader.force_login(TestQueryBudget.reader)
+        cache.clear()
+
+    def test_pages_fit_query_budget(self):
+        kwargs = {
+            'posts:group_list': {'slug': self.group.slug},
+            'posts:profile': {'username': self.user.username},
+            'posts:post_detail': {'post_id': self.post.id},
+        }
+        for name, (data_budget, cache_budget) in self.QUERY_BUDGET.items():
+            with self.subTest(name=name):
+                address = reverse(name, kwargs=kwargs.get(name))
+                self.reader.get(address)
+                bump_generation()
+                cache.clear_local()
+                with CaptureQueriesContext(connection) as queries:
+                    self.reader.get(address)
+                cache_queries = [
+                    query['sql'] for query in queries
+                    if 'yatube_cache' in query['sql']
+                    or 'SAVEPOINT' in query['sql']
+                ]
+                data_queries = [
+                    query['sql'] for query in queries
+                    if query['sql'] not in cache_queries
+                ]
+                self.assertLessEqual(
+                    len(data_queries), data_budget, '\n'.join(data_queries)
+                )
+                self.assertLessEqual(
+                    len(cache_queries), cache_budget,
+                    '\n'.join(cache_queries)
+                )
+                card_queries = [
+                    sql for sql in cache_queries
+                    if 'template.cache.post_card' in sql
+                ]
+                self.assertLessEqual(len(card_queries), 1)
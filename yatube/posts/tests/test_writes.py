@@ -0,0 +1,98 @@
+import threading
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from mixer.backend.django import mixer
+
+from posts import writes
+from posts.models import FeedEntry, Follow, Post, Profile, User
+from posts.writes import WriteBuffer, save_follows
+
+
+class TestWriteBuffer(SimpleTestCase):
+    def test_concurrent_writes_are_batched(self):
+        '''Записи из разных потоков сохраняются общими пачками.'''
+        batches = []
+
+        def handler(items):
+            batches.append(len(items))
+            return [
+                ValueError(item) if item == 3 else item * 2 for item in items
+            ]
+
+        buffer = WriteBuffer(handler, batch_size=100, interval=0.2)
+        results = {}
+
+        def write(item):
+            try:
+                results[item] = buffer.submit(item).result(5)
+            except ValueError:
+                results[item] = 'error'
+
+        threads = [
+            threading.Thread(target=write, args=(item,)) for item in range(20)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sum(batches), 20)
+        self.assertLess(len(batches), 20)
+        self.assertEqual(results[3], 'error')
+        self.assertEqual(results[5], 10)
+
+    def test_thread_survives_errors(self):
+        '''Ошибка вне handler не останавливает поток записи.'''
+        buffer = WriteBuffer(lambda items: items, interval=0)
+        with patch('posts.writes.close_old_connections',
+                   side_effect=[RuntimeError('сбой'), None]):
+            with self.assertRaises(RuntimeError):
+                buffer.submit(1).result(5)
+            self.assertEqual(buffer.submit(2).result(5), 2)
+
+    @override_settings(POSTS_WRITE_BUFFER=True)
+    @patch('posts.writes.WRITE_TIMEOUT', 0.1)
+    def test_timeout_saves_once(self):
+        '''Запись, не дождавшаяся очереди, сохраняется один раз сама.'''
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def handler(items):
+            calls.append(items)
+            if items == ['first']:
+                started.set()
+                release.wait(5)
+            return items
+
+        first = threading.Thread(
+            target=writes._write, args=(handler, 'first'))
+        first.start()
+        started.wait(5)
+        try:
+            self.assertEqual(writes._write(handler, 'second'), 'second')
+        finally:
+            release.set()
+            first.join()
+        buffer = writes._buffers.pop(handler)
+        self.assertEqual(buffer.submit('third').result(5), 'third')
+        self.assertEqual(calls, [['first'], ['second'], ['third']])
+
+
+class TestSaveFollows(TestCase):
+    def test_duplicates_are_skipped(self):
+        '''Повторные подписки не создаются и не меняют счетчики.'''
+        author = mixer.blend(User, username='Author')
+        reader = mixer.blend(User, username='Reader')
+        post = mixer.blend(Post, author=author)
+        results = save_follows([
+            Follow(user=reader, author=author),
+            Follow(user=reader, author=author),
+        ])
+        self.assertEqual(results, [True, False])
+        self.assertEqual(save_follows([Follow(user=reader, author=author)]),
+                         [False])
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(Profile.objects.get(user=author).followers_count, 1)
+        self.assertEqual(Profile.objects.get(user=reader).following_count, 1)
+        self.assertTrue(
+            FeedEntry.objects.filter(user=reader, post=post).exists())
@@ -0,0 +1,88 @@
+'''
+Фоновая подготовка миниатюр картинок постов.
+
+При сохранении поста с новой картинкой (из формы, админки или кода,
+см. signals.image_changed) в таблицу ThumbnailJob добавляется задание,
+а пост помечается image_ready=False: пока миниатюры не готовы, шаблоны
+выводят исходную картинку и не тратят время запроса на ее обработку.
+Задания выполняет команда thumbnail_worker в пуле процессов.
+'''
+from datetime import timedelta
+
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+from sorl.thumbnail import get_thumbnail
+from sorl.thumbnail.base import ThumbnailBackend
+
+from core.metrics import timer
+
+from .constants import THUMBNAIL_LEASE, THUMBNAIL_SIZES
+from .images import format_variants, generate_variants
+from .models import ThumbnailJob
+
+
+class TimedThumbnailBackend(ThumbnailBackend):
+    '''Бэкенд sorl.thumbnail, замеряющий время подготовки миниатюр.'''
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        with timer('thumbnail', exclude=('sql',)):
+            return super().get_thumbnail(file_, geometry_string, **options)
+
+
+def enqueue(post):
+    '''Ставит в очередь подготовку миниатюр картинки поста.'''
+    return ThumbnailJob.objects.create(post=post)
+
+
+def claim_jobs(limit):
+    '''
+    Забирает из очереди до limit заданий. Задание достается тому
+    обработчику, которому удалось перевести его в состояние RUNNING.
+    Задания, которые дольше THUMBNAIL_LEASE секунд остаются в RUNNING,
+    брошены завершившимся обработчиком и забираются снова.
+    '''
+    now = timezone.now()
+    available = Q(status=ThumbnailJob.PENDING) | Q(
+        status=ThumbnailJob.RUNNING,
+        claimed_at__lt=now - timedelta(seconds=THUMBNAIL_LEASE)
+    )
+    job_ids = ThumbnailJob.objects.filter(available).values_list(
+        'pk', flat=True)[:limit]
+    return [
+        job_id for job_id in job_ids
+        if ThumbnailJob.objects.filter(available, pk=job_id).update(
+            status=ThumbnailJob.RUNNING, claimed_at=now)
+    ]
+
+
+def process_job(job_id):
+    '''
+    Создает все миниатюры и адаптивные варианты картинки поста
+    из задания job_id. Возвращает None, если задания уже нет.
+    '''
+    try:
+        job = ThumbnailJob.objects.select_related('post').get(pk=job_id)
+    except ThumbnailJob.DoesNotExist:
+        # Пост удален вместе с заданием, пока оно ждало обработки
+        return None
+    post = job.post
+    try:
+        for geometry, options in THUMBNAIL_SIZES.items():
+            get_thumbnail(post.image, geometry, **options)
+        variants = generate_variants(post.image)
+    except Exception as error:
+        ThumbnailJob.objects.filter(pk=job_id).update(
+            status=ThumbnailJob.FAILED, error=str(error))
+        return False
+    ThumbnailJob.objects.filter(pk=job_id).update(status=ThumbnailJob.DONE)
+    # Сохранение с updated_at меняет ключ кеша карточки поста.
+    post.image_ready = True
+    post.image_variants = format_variants(variants)
+    post.save(update_fields=('image_ready', 'image_variants', 'updated_at'))
+    return True
+
+
+def init_worker():
+    '''Процессы пула не должны использовать соединения родителя с БД.'''
+    connections.close_all()
@@ -1,14 +1,135 @@
-from django.core.paginator import Paginator
+import base64
+import binascii
+import json
+
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
 
 from .constants import NUMBER_POST_PER_PAGE
 
 
+class CursorPage(Page):
+    '''
+    Страница курсорного паджинатора. Вместо номеров страниц хранит
+    непрозрачные токены соседних страниц: next_cursor и previous_cursor.
+    '''
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, next_cursor=None,
+                 previous_cursor=None):
+        super().__init__(object_list, None, paginator)
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<Cursor page>'
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class CursorPaginator(Paginator):
+    '''
+    Паджинатор по ключу (field, pk) без COUNT(*) и OFFSET.
+    Записи выводятся от новых к старым, страница выбирается условием
+    (field, pk) < (значение, pk) по последней записи предыдущей страницы.
+    '''
+
+    def __init__(self, object_list, per_page, field='pub_date'):
+        self.field = field
+        super().__init__(
+            object_list.order_by(f'-{field}', '-pk'), per_page
+        )
+
+    @staticmethod
+    def encode_cursor(obj, field, backwards=False):
+        data = [getattr(obj, field).isoformat(), obj.pk, backwards]
+        raw = json.dumps(data).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor):
+        padding = '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(cursor + padding)
+        value, pk, backwards = json.loads(raw.decode())
+        value = parse_datetime(value)
+        if value is None or not isinstance(pk, int):
+            raise ValueError('Некорректный курсор')
+        return value, pk, bool(backwards)
+
+    def get_cursor_page(self, cursor):
+        '''
+        Возвращает страницу, следующую за курсором. Пустой или
+        испорченный курсор означает первую страницу.
+        '''
+        try:
+            position = self.decode_cursor(cursor) if cursor else None
+        except (ValueError, TypeError, binascii.Error):
+            position = None
+        field = self.field
+        limit = self.per_page + 1
+        if position is None:
+            items = list(self.object_list[:limit])
+            has_more = len(items) > self.per_page
+            items = items[:self.per_page]
+            return CursorPage(
+                items, self,
+                next_cursor=(self.encode_cursor(items[-1], field)
+                             if has_more else None),
+            )
+        value, pk, backwards = position
+        if backwards:
+            items = list(
+                self.object_list.filter(
+                    Q(**{f'{field}__gt': value})
+                    | Q(**{field: value, 'pk__gt': pk})
+                ).order_by(field, 'pk')[:limit]
+            )
+            has_more = len(items) > self.per_page
+            items = items[:self.per_page][::-1]
+            if not items:
+                return self.get_cursor_page(None)
+            return CursorPage(
+                items, self,
+                next_cursor=self.encode_cursor(items[-1], field),
+                previous_cursor=(self.encode_cursor(items[0], field, True)
+                                 if has_more else None),
+            )
+        items = list(
+            self.object_list.filter(
+                Q(**{f'{field}__lt': value})
+                | Q(**{field: value, 'pk__lt': pk})
+            )[:limit]
+        )
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+        if not items:
+            return CursorPage(items, self)
+        return CursorPage(
+            items, self,
+            next_cursor=(self.encode_cursor(items[-1], field)
+                         if has_more else None),
+            previous_cursor=self.encode_cursor(items[0], field, True),
+        )
+
+
 def get_page_of_list(request, list):
     '''
     Вычисляет возвращает фрагмент из из списка list, который должен быть
     выведен на html-странице с номером 'page' при использовании паджинатора.
     NUMBER_POST_PER_PAGE - количество элементов списка на одной странице.
     'page' передается в http запросе при обработке шаблона html.
+    Если в запросе передан параметр 'cursor' (в том числе пустой),
+    используется курсорный паджинатор без подсчета общего числа записей.
     '''
+    cursor = request.GET.get('cursor')
+    if cursor is not None:
+        return CursorPaginator(
+            list, NUMBER_POST_PER_PAGE
+        ).get_cursor_page(cursor)
     paginator = Paginator(list, NUMBER_POST_PER_PAGE)
     return paginator.get_page(request.GET.get('page'))
@@ -1,28 +1,44 @@
+from urllib.parse import urlencode
+
 from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
-from django.views.decorators.cache import cache_page
-
+from django.views.decorators.http import require_safe
+
+from posts import search as post_search
+from posts import follows, writes
+from posts.api import comment_page_data, serialize_comment
+from posts.comments import get_comments_page, get_parent, get_thread
+from posts.conditional import (conditional_page, group_etag,
+                               group_last_modified, post_etag,
+                               post_last_modified, profile_etag,
+                               request_post_state)
+from posts.constants import NUMBER_POST_PER_PAGE
+from posts.counters import get_profile
+from posts.feed import build_feed, get_follow_feed
 from posts.forms import CommentForm, PostForm
-from posts.models import Follow, Group, Post, User
+from posts.models import Comment, Group, Post, User
+from posts.page_cache import versioned_cache_page
 from posts.utils import get_page_of_list
 
 
-@cache_page(20, key_prefix='index_page')
+@versioned_cache_page(key_prefix='index_page')
 def index(request):
     '''Контроллер главной страницы.'''
-    post_list = (Post.objects.select_related('author').
-                 order_by('-pub_date'))
+    post_list = build_feed(Post.objects.order_by('-pub_date'))
     context = {
         'page_obj': get_page_of_list(request, post_list),
     }
     return render(request, 'posts/index.html', context)
 
 
+@conditional_page(group_etag, group_last_modified)
 def group_posts(request, slug):
     '''Контроллер страницы группы.'''
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
+    post_list = build_feed(group.posts.all())
     context = {
         'group': group,
         'page_obj': get_page_of_list(request, post_list),
@@ -30,38 +46,105 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@conditional_page(profile_etag)
 def profile(request, username):
     '''Контроллер страницы профиля автора (пользователя).'''
     author = get_object_or_404(User, username=username)
-    post_list = author.posts.all()
+    post_list = build_feed(author.posts.all())
     context = {
         'author': author,
+        'profile': get_profile(author),
         'page_obj': get_page_of_list(request, post_list),
     }
-    context['following'] = (
-        request.user.is_authenticated
-        and Follow.objects.filter(user=request.user, author=author).exists()
-    )
+    context['following'] = author.pk in follows.request_following(request)
     return render(request, 'posts/profile.html', context)
 
 
+def search(request):
+    '''Контроллер страницы поиска по текстам постов.'''
+    query = request.GET.get('q', '').strip()
+    paginator = Paginator(
+        post_search.search(query) if query else [], NUMBER_POST_PER_PAGE
+    )
+    page_obj = paginator.get_page(request.GET.get('page'))
+    # Индекс возвращает id постов, сами посты загружаются только
+    # для текущей страницы с сохранением порядка релевантности
+    posts = build_feed(Post.objects.all()).in_bulk(page_obj.object_list)
+    page_obj.object_list = [
+        posts[pk] for pk in page_obj.object_list if pk in posts
+    ]
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@conditional_page(post_etag, post_last_modified)
 def post_detail(request, post_id):
     '''Контроллер страницы конкретного поста с id.'''
-    post = get_object_or_404(Post, id=post_id)
-    author = get_object_or_404(User, id=post.author_id)
-    count_posts = Post.objects.filter(author_id=post.author_id).count()
-    comments = post.comments.all()
+    post = get_object_or_404(build_feed(Post.objects.all()), id=post_id)
+    author = post.author
+    count_posts = get_profile(author).posts_count
+    comments = get_comments_page(post.pk)
     form = CommentForm(request.POST or None)
+    reply_to = request.GET.get('reply_to', '')
     context = {
         'author': author,
         'count_posts': count_posts,
         'post': post,
         'comments': comments,
         'form': form,
+        'reply_to': reply_to if reply_to.isdigit() else None,
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@require_safe
+@conditional_page(post_etag, post_last_modified)
+def comments(request, post_id):
+    '''
+    Следующая страница комментариев к посту: фрагмент HTML
+    или JSON при параметре format=json.
+    '''
+    if request_post_state(request, post_id) is None:
+        raise Http404
+    page = get_comments_page(post_id, request.GET.get('cursor'))
+    if request.GET.get('format') == 'json':
+        return JsonResponse(comment_page_data(request, post_id, page))
+    context = {
+        'comments': page,
+        'post_id': post_id,
+    }
+    return render(request, 'posts/includes/comment_list.html', context)
+
+
+@require_safe
+def comment_thread(request, post_id, comment_id):
+    '''Ответы на комментарий: фрагмент HTML или JSON.'''
+    comment = get_object_or_404(
+        Comment.objects.only('post_id', 'path'), post_id=post_id, pk=comment_id
+    )
+    replies, next_after = get_thread(comment, request.GET.get('after'))
+    if request.GET.get('format') == 'json':
+        next_url = None
+        if next_after is not None:
+            next_url = request.build_absolute_uri(
+                f'{request.path}?'
+                + urlencode({'after': next_after, 'format': 'json'}))
+        return JsonResponse({
+            'results': [serialize_comment(reply) for reply in replies],
+            'next': next_url,
+        })
+    context = {
+        'replies': replies,
+        'post_id': post_id,
+        'comment_id': comment_id,
+        'next_after': next_after,
+    }
+    return render(request, 'posts/includes/comment_thread.html', context)
+
+
 @login_required
 def add_comment(request, post_id):
     '''Контроллер добавления нового комментария к посту.'''
@@ -71,7 +154,8 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        comment.parent = get_parent(post.pk, request.POST.get('parent'))
+        writes.add_comment(comment)
     return redirect('posts:post_detail', post_id=post_id)
 
 
@@ -103,7 +187,7 @@ def post_create(request):
 def post_edit(request, post_id):
     '''Контроллер страницы редактирования поста.'''
     post = get_object_or_404(Post, id=post_id)
-    if request.user != post.author:
+    if request.user.id != post.author_id:
         return redirect('posts:post_detail', post_id=post_id)
     context = {'is_edit': True, }
 
@@ -126,7 +210,7 @@ def post_edit(request, post_id):
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
+    post_list = build_feed(get_follow_feed(request.user))
     context = {
         'page_obj': get_page_of_list(request, post_list),
     }
@@ -137,17 +221,12 @@ def follow_index(request):
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if not request.user == author:
-        if not (
-            Follow.objects.filter(user=request.user, author=author).exists()
-        ):
-            Follow.objects.create(user=request.user, author=author)
+        writes.add_follow(request.user.pk, author.pk)
     return redirect(reverse('posts:profile', args=[username]))
 
 
 @login_required
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    follows = Follow.objects.filter(user=request.user, author=author)
-    for record in follows:
-        record.delete()
+    follows.unfollow_many(request.user.pk, [author.pk])
     return redirect(reverse('posts:profile', args=[username]))
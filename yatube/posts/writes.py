@@ -0,0 +1,195 @@
+'''
+Буферизованная запись комментариев и подписок.
+
+Под нагрузкой каждая отдельная вставка в SQLite ждет блокировку записи
+и делает свой COMMIT. WriteBuffer собирает записи из всех потоков
+процесса в очередь, а фоновый поток сохраняет их пачками в одной
+транзакции: пачка закрывается, когда набралось WRITE_BATCH_SIZE записей
+или прошло WRITE_FLUSH_INTERVAL секунд с первой. Запрос ждет, пока его
+запись сохранится, поэтому следующая страница ее уже показывает.
+Если запись не дождалась очереди за WRITE_TIMEOUT секунд, она снимается
+с очереди и сохраняется в потоке запроса.
+
+Без настройки POSTS_WRITE_BUFFER (в том числе в тестах) записи
+сохраняются сразу, в потоке запроса.
+'''
+import queue
+import threading
+import time
+from concurrent import futures
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, transaction
+from django.db.models.signals import post_save
+
+from core.db import is_busy, retry_on_busy
+
+from .constants import WRITE_BATCH_SIZE, WRITE_FLUSH_INTERVAL, WRITE_TIMEOUT
+from .counters import ensure_profiles
+from .models import Follow
+
+
+class WriteBuffer:
+    '''
+    Очередь записей с фоновым потоком, который передает их handler
+    пачками. handler возвращает по результату на запись; результат-
+    исключение передается только автору этой записи.
+    '''
+
+    def __init__(self, handler, batch_size=WRITE_BATCH_SIZE,
+                 interval=WRITE_FLUSH_INTERVAL):
+        self.handler = handler
+        self.batch_size = batch_size
+        self.interval = interval
+        self.queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, item):
+        '''Ставит запись в очередь; результат можно получить из Future.'''
+        future = futures.Future()
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, daemon=True,
+                    name=f'write-buffer-{self.handler.__name__}'
+                )
+                self._thread.start()
+        self.queue.put((item, future))
+        return future
+
+    def _collect(self):
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            # Записи, снятые с очереди по таймауту (см. _write), пропускаются
+            batch = [
+                (item, future) for item, future in self._collect()
+                if future.set_running_or_notify_cancel()
+            ]
+            if not batch:
+                continue
+            try:
+                close_old_connections()
+                self.flush(batch)
+            except Exception as error:
+                # Поток не должен завершаться: иначе все следующие
+                # записи будут ждать до таймаута.
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+
+    def flush(self, batch):
+        try:
+            results = self.handler([item for item, _ in batch])
+        except Exception as error:
+            for _, future in batch:
+                future.set_exception(error)
+            return
+        for (_, future), result in zip(batch, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+@retry_on_busy
+def save_comments(comments):
+    '''
+    Сохраняет комментарии одной транзакцией. У каждого своя точка
+    сохранения, поэтому ошибка в одном не отменяет остальные; если
+    база занята, повторяется вся пачка.
+    '''
+    results = []
+    with transaction.atomic():
+        for comment in comments:
+            try:
+                with transaction.atomic():
+                    comment.save()
+            except DatabaseError as error:
+                if is_busy(error):
+                    raise
+                results.append(error)
+            else:
+                results.append(comment)
+    return results
+
+
+@retry_on_busy
+def save_follows(follows):
+    '''
+    Сохраняет подписки одним bulk_create. Существующие и повторные
+    подписки пропускаются (на случай гонки с другим процессом - еще
+    и ограничением unique_follow), для новых отправляется post_save,
+    как при обычном сохранении. Результат - создана ли подписка.
+    '''
+    with transaction.atomic():
+        existing = set(Follow.objects.filter(
+            user_id__in={follow.user_id for follow in follows},
+            author_id__in={follow.author_id for follow in follows},
+        ).values_list('user_id', 'author_id'))
+        new = {}
+        for follow in follows:
+            key = (follow.user_id, follow.author_id)
+            if key not in existing:
+                new.setdefault(key, follow)
+        ensure_profiles({user_id for pair in new for user_id in pair})
+        Follow.objects.bulk_create(new.values(), ignore_conflicts=True)
+        for follow in new.values():
+            post_save.send(Follow, instance=follow, created=True,
+                           raw=False, using=Follow.objects.db,
+                           update_fields=None)
+    return [
+        new.get((follow.user_id, follow.author_id)) is follow
+        for follow in follows
+    ]
+
+
+_buffers = {}
+_buffers_lock = threading.Lock()
+
+
+def _write_now(handler, item):
+    result, = handler([item])
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+
+def _write(handler, item):
+    if not getattr(settings, 'POSTS_WRITE_BUFFER', False):
+        return _write_now(handler, item)
+    with _buffers_lock:
+        buffer = _buffers.get(handler)
+        if buffer is None:
+            buffer = _buffers[handler] = WriteBuffer(handler)
+    future = buffer.submit(item)
+    try:
+        return future.result(WRITE_TIMEOUT)
+    except futures.TimeoutError:
+        if future.cancel():
+            # Запись так и не попала в пачку: сохраняем ее сами
+            return _write_now(handler, item)
+    # Пачка с записью уже сохраняется: ответ зависит от ее результата
+    return future.result()
+
+
+def add_comment(comment):
+    '''Сохраняет новый комментарий.'''
+    return _write(save_comments, comment)
+
+
+def add_follow(user_id, author_id):
+    '''Подписывает пользователя на автора; True, если подписки не было.'''
+    return _write(save_follows, Follow(user_id=user_id, author_id=author_id))
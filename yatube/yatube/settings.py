@@ -32,7 +32,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'posts.middleware.AnonymousPageCacheMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -45,7 +47,7 @@ ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backends.TimedDjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -63,13 +65,33 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
+# Точка входа для ASGI-серверов: yatube.asgi.application. Запросы
+# выполняются в пуле из ASGI_THREADS потоков (см. core/asgi.py).
+ASGI_THREADS = 16
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'OPTIONS': {
+            # Сколько секунд ждать, пока база занята другой записью
+            'timeout': 20,
+        },
     }
 }
 
+# PRAGMA, которые выполняются при открытии соединения с SQLite
+# (см. core/db.py), и повторы транзакций, если база занята.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
+}
+SQLITE_BUSY_RETRIES = 5
+SQLITE_BUSY_DELAY = 0.05
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -112,9 +134,59 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Время подготовки миниатюр учитывается в метриках запроса
+THUMBNAIL_BACKEND = 'posts.thumbnails.TimedThumbnailBackend'
+
 # Спринт:6 Тема:1 Урок:7
+# Общий для всех процессов кеш хранится в таблице БД (создается при
+# migrate, см. core/apps.py), перед ним - локальный LRU-кеш каждого процесса.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.cache.NearCache',
+        'LOCATION': 'shared',
+        'OPTIONS': {
+            'MAX_SIZE': 16 * 1024 * 1024,
+            'LOCAL_TIMEOUT': 5,
+            'BYPASS_PREFIXES': ('posts:generation', 'posts:follows'),
+        },
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'yatube_cache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
+
+# Комментарии и подписки сохраняются пачками из фонового потока
+# (см. posts/writes.py); без буфера - сразу в потоке запроса.
+POSTS_WRITE_BUFFER = False
+
+# Журнал медленных (дольше SLOW_QUERY_MS миллисекунд) и повторяющихся
+# SQL-запросов ведется для доли QUERY_LOG_SAMPLE_RATE HTTP-запросов.
+SLOW_QUERY_MS = 100
+QUERY_LOG_SAMPLE_RATE = 1.0 if DEBUG else 0.01
+
+# В тестах журнал выключен (см. core/test_runner.py): тесты, которым
+# он нужен, включают его через override_settings.
+TEST_RUNNER = 'core.test_runner.TestRunner'
+
+# У обработчика нет фильтра require_debug_true, как у console в
+# настройках Django по умолчанию: журнал пишется и без DEBUG.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'queries': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'yatube.queries': {
+            'handlers': ['queries'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
 }
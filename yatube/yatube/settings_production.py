@@ -0,0 +1,41 @@
+'''
+Настройки боевого сервера:
+DJANGO_SETTINGS_MODULE=yatube.settings_production.
+
+Ключ и список хостов задаются переменными окружения DJANGO_SECRET_KEY
+и DJANGO_ALLOWED_HOSTS (через запятую).
+'''
+import os
+
+from . import settings as base
+from .settings import *  # noqa: F401,F403
+
+DEBUG = False
+
+SECRET_KEY = os.environ['DJANGO_SECRET_KEY']
+
+ALLOWED_HOSTS = os.environ.get('DJANGO_ALLOWED_HOSTS', 'localhost').split(',')
+
+# Соединение с базой живет между запросами, а не открывается заново
+# (вместе с PRAGMA из SQLITE_PRAGMAS) на каждый запрос.
+DATABASES = {
+    'default': {**base.DATABASES['default'], 'CONN_MAX_AGE': 60},
+}
+
+# Шаблоны разбираются один раз на процесс: cached.Loader хранит
+# скомпилированные шаблоны, включая base.html и все include.
+TEMPLATES = [{
+    **base.TEMPLATES[0],
+    'APP_DIRS': False,
+    'OPTIONS': {
+        **base.TEMPLATES[0]['OPTIONS'],
+        'loaders': [
+            ('django.template.loaders.cached.Loader', [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ]),
+        ],
+    },
+}]
+
+POSTS_WRITE_BUFFER = True